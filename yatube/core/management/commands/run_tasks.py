@@ -0,0 +1,36 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры фоновой очереди задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.TASKS_WORKERS,
+            help='Число потоков-воркеров'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            tasks.release_stale()
+            done = tasks.run_pending()
+            self.stdout.write(self.style.SUCCESS(
+                f'Выполнено задач: {done}'))
+            return
+        stop = threading.Event()
+        self.stdout.write(
+            f'Воркеров: {options["workers"]}, остановка по Ctrl+C')
+        tasks.run_workers(options['workers'], stop, options['poll'])
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+SAVEPOINT_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(limit, using=DEFAULT_DB_ALIAS):
+    """Падает, если внутри блока выполнено больше limit SQL-запросов.
+
+    Работает и как декоратор представления. Проверка включается настройкой
+    QUERY_BUDGET_ENABLED, которая по умолчанию совпадает с DEBUG, так что
+    в разработке и в тестах лишние запросы сразу дают ошибку.
+    """
+    if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+        yield
+        return
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        if not sql.startswith(SAVEPOINT_STATEMENTS):
+            queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(count_query):
+        yield
+    if len(queries) > limit:
+        raise QueryBudgetExceeded(
+            f'Выполнено {len(queries)} запросов при бюджете {limit}:\n'
+            + '\n'.join(queries)
+        )
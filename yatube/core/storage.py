@@ -0,0 +1,51 @@
+import hashlib
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+HASH_NAME = re.compile(r'(?:^|/)(?:[0-9a-f]{2}/){2}[0-9a-f]{64}(?:\.\w+)?$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла - SHA-256 его содержимого.
+
+    Файлы раскладываются по вложенным каталогам по первым символам хеша,
+    каталог из upload_to (например, posts/) сохраняется. Повторная
+    загрузка того же файла возвращает имя уже сохраненного, поэтому
+    один файл может принадлежать нескольким записям.
+    """
+
+    shard_depth = 2
+    shard_width = 2
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        content_hash = digest.hexdigest()
+        shards = [
+            content_hash[index:index + self.shard_width]
+            for index in range(
+                0, self.shard_depth * self.shard_width, self.shard_width)
+        ]
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), *shards, content_hash + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+
+def is_content_addressed(name):
+    return bool(HASH_NAME.search(name))
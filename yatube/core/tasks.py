@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+STALE_CHECK_INTERVAL = 60
+
+_registry = {}
+
+
+def task(name):
+    """Зарегистрировать функцию как задачу очереди под именем name."""
+    def register(function):
+        _registry[name] = function
+        return function
+    return register
+
+
+def enqueue(name, *args):
+    """Поставить задачу в очередь.
+
+    Строка задачи пишется в той же транзакции, что и изменение, которое
+    ее породило, поэтому откат запроса отменяет и задачу. С
+    TASKS_ALWAYS_EAGER задача выполняется сразу в текущем процессе.
+    """
+    if name not in _registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    if settings.TASKS_ALWAYS_EAGER:
+        _registry[name](*args)
+        return None
+    return Task.objects.create(name=name, args=json.dumps(args))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def release_stale():
+    """Вернуть в очередь задачи, чей воркер пропал, не закончив работу."""
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=deadline,
+    ).update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def claim(worker):
+    """Забрать следующую готовую задачу или вернуть None.
+
+    Задача переводится в работу условным UPDATE: если ее уже забрал
+    другой воркер, строка не обновится, и берется следующая.
+    """
+    while True:
+        now = timezone.now()
+        task_id = Task.objects.filter(
+            status=Task.QUEUED, run_at__lte=now,
+        ).values_list('id', flat=True).first()
+        if task_id is None:
+            return None
+        claimed = Task.objects.filter(id=task_id, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(id=task_id)
+
+
+def execute(job):
+    """Выполнить задачу: удалить ее после успеха или отложить повтор.
+
+    Повторы идут с экспоненциальной задержкой, после TASKS_MAX_ATTEMPTS
+    попыток задача остается со статусом failed и текстом ошибки.
+    """
+    function = _registry.get(job.name)
+    try:
+        if function is None:
+            raise KeyError(f'Неизвестная задача: {job.name}')
+        function(*json.loads(job.args))
+    except Exception:
+        logger.exception('Задача %s #%s упала', job.name, job.id)
+        job.last_error = traceback.format_exc()
+        job.locked_by = ''
+        job.locked_at = None
+        if job.attempts >= settings.TASKS_MAX_ATTEMPTS:
+            job.status = Task.FAILED
+        else:
+            job.status = Task.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=settings.TASKS_RETRY_DELAY * 2 ** (job.attempts - 1))
+        job.save()
+        return False
+    Task.objects.filter(id=job.id).delete()
+    return True
+
+
+def run_pending(worker=None, limit=None):
+    """Выполнять готовые задачи, пока они есть; вернуть число выполненных."""
+    worker = worker or worker_name()
+    done = 0
+    while limit is None or done < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        execute(job)
+        done += 1
+    return done
+
+
+def work(stop, poll_interval):
+    """Цикл воркера: разбирать очередь, пока не выставлен stop.
+
+    Задачи берутся по одной, и stop проверяется перед каждой, поэтому
+    остановленный воркер доделывает только текущую задачу. Раз в
+    STALE_CHECK_INTERVAL секунд воркер возвращает в очередь задачи
+    упавших воркеров, не дожидаясь перезапуска.
+    """
+    worker = worker_name()
+    checked = None
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            now = time.monotonic()
+            if checked is None or now - checked >= STALE_CHECK_INTERVAL:
+                release_stale()
+                checked = now
+            if not run_pending(worker, limit=1):
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+def run_workers(count, stop, poll_interval=1.0):
+    """Запустить count потоков-воркеров и дождаться stop.
+
+    По Ctrl+C воркеры дорабатывают текущую задачу и выходят.
+    """
+    threads = [
+        threading.Thread(
+            target=work, args=(stop, poll_interval),
+            name=f'tasks-{number}', daemon=True,
+        )
+        for number in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
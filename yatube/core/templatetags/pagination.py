@@ -0,0 +1,43 @@
+from django import template
+
+
+register = template.Library()
+
+ELLIPSIS = '…'
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Строка запроса текущей страницы с замененными параметрами.
+
+    Остальные параметры (например, поисковый запрос) сохраняются.
+    """
+    query = context['request'].GET.copy()
+    for name, value in params.items():
+        query[name] = value
+    return '?' + query.urlencode()
+
+
+@register.simple_tag
+def elided_page_range(page_obj, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям, остальное заменено на «…».
+
+    Число ссылок не зависит от размера ленты.
+    """
+    number = page_obj.number
+    num_pages = page_obj.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > on_each_side + on_ends + 1:
+        pages += list(range(1, on_ends + 1)) + [ELLIPSIS]
+        pages += list(range(number - on_each_side, number + 1))
+    else:
+        pages += list(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends:
+        pages += list(range(number + 1, number + on_each_side + 1))
+        pages += [ELLIPSIS]
+        pages += list(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages += list(range(number + 1, num_pages + 1))
+    return pages
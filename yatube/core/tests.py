@@ -0,0 +1,203 @@
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import tasks
+from .cache import SQLiteCache
+from .models import Task
+from .storage import ContentAddressedStorage, is_content_addressed
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        """Запись из одного экземпляра видна другому, как другому воркеру."""
+        self.cache.set('key', {'value': 1})
+        other = self.make_cache()
+        self.assertEqual(other.get('key'), {'value': 1})
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_incr_and_expiry(self):
+        """add не перезаписывает живой ключ, incr меняет значение."""
+        self.assertTrue(self.cache.add('counter', 1, None))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('short', 'value', -1)
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertTrue(self.cache.add('short', 'new'))
+        self.assertEqual(
+            self.cache.get_many(['counter', 'short', 'missing']),
+            {'counter': 3, 'short': 'new'})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """При превышении MAX_ENTRIES вытесняются давно читавшиеся ключи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, ACCESS_RESOLUTION=0)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get_many(['a', 'c', 'd']),
+                         {'a': 'a', 'c': 'c', 'd': 'd'})
+
+    def test_size_limit(self):
+        """Суммарный объем значений не превышает MAX_SIZE."""
+        cache = self.make_cache(MAX_SIZE=2048, CULL_FREQUENCY=2)
+        for i in range(10):
+            cache.set(f'key{i}', b'x' * 500)
+        entries, size = cache._connection.execute(
+            'SELECT entries, size FROM stats').fetchone()
+        self.assertLessEqual(size, 2048)
+        self.assertLess(entries, 10)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_name_is_sharded_content_hash(self):
+        """Файл сохраняется под хешем содержимого во вложенных каталогах."""
+        name = self.storage.save('posts/Photo.JPG', ContentFile(b'picture'))
+        self.assertRegex(
+            name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertTrue(name.startswith(
+            f'posts/{name[-68:-66]}/{name[-66:-64]}/'))
+        self.assertTrue(is_content_addressed(name))
+        self.assertFalse(is_content_addressed('posts/photo.jpg'))
+
+    def test_identical_uploads_are_deduplicated(self):
+        """Одинаковые файлы хранятся один раз, разные - отдельно."""
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        other = self.storage.save('posts/c.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        files = [
+            name for _, _, names in os.walk(self.directory) for name in names
+        ]
+        self.assertEqual(len(files), 2)
+
+
+calls = []
+
+
+@tasks.task('core.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@tasks.task('core.tests.stop')
+def stop_worker():
+    worker_stop.set()
+
+
+worker_stop = threading.Event()
+
+
+@tasks.task('core.tests.fail')
+def fail():
+    raise ValueError('сбой')
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False, TASKS_MAX_ATTEMPTS=2,
+                   TASKS_RETRY_DELAY=60)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_task_waits_for_worker(self):
+        """Задача сохраняется в очереди и выполняется воркером."""
+        tasks.enqueue('core.tests.record', 1)
+        self.assertEqual(calls, [])
+        call_command('run_tasks', '--once', stdout=StringIO())
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        tasks.enqueue('core.tests.record', 2)
+        self.assertEqual(calls, [2])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_is_retried_then_kept(self):
+        """Упавшая задача откладывается, после лимита попыток помечается."""
+        job = tasks.enqueue('core.tests.fail')
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(tasks.run_pending(), 0)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Task.FAILED, 2))
+        self.assertIn('ValueError', job.last_error)
+
+    def test_running_task_is_not_claimed_twice(self):
+        """Задачу в работе не берет другой воркер, пока она не зависла."""
+        job = tasks.enqueue('core.tests.record', 3)
+        self.assertEqual(tasks.claim('first').id, job.id)
+        self.assertIsNone(tasks.claim('second'))
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(tasks.release_stale(), 1)
+        self.assertEqual(tasks.claim('second').id, job.id)
+
+    def test_worker_loop_releases_stale_tasks(self):
+        """Работающий воркер подбирает задачи воркера, упавшего позже."""
+        job = tasks.enqueue('core.tests.stop')
+        tasks.claim('crashed')
+        waits = []
+
+        def wait(timeout):
+            if waits:
+                worker_stop.set()
+            waits.append(timeout)
+            Task.objects.update(
+                locked_at=timezone.now() - timedelta(hours=1))
+
+        worker_stop.clear()
+        with patch('core.tasks.STALE_CHECK_INTERVAL', 0), \
+                patch.object(worker_stop, 'wait', side_effect=wait):
+            tasks.work(worker_stop, poll_interval=0)
+        self.assertEqual(len(waits), 1)
+        self.assertFalse(Task.objects.filter(id=job.id).exists())
+
+    def test_stopped_worker_leaves_rest_of_queue(self):
+        """После stop воркер доделывает текущую задачу и выходит."""
+        tasks.enqueue('core.tests.stop')
+        tasks.enqueue('core.tests.record', 1)
+        tasks.enqueue('core.tests.record', 2)
+        worker_stop.clear()
+        tasks.work(worker_stop, poll_interval=0)
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.count(), 2)
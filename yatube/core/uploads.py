@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет каждый загружаемый файл во временный файл на диске.
+
+    Данные сверх UPLOAD_MAX_SIZE не записываются, но размер файла
+    считается полностью: форма по нему отклонит загрузку, а ни память,
+    ни диск не растут вслед за присланным объемом.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.UPLOAD_MAX_SIZE:
+            return None
+        return super().receive_data_chunk(raw_data, start)
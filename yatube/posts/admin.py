@@ -1,4 +1,5 @@
 from django.contrib import admin
+from . import search
 from .models import Post, Group, Comment, Follow
 
 
@@ -15,6 +16,11 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and search.enabled():
+            return search.matching(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = (
@@ -0,0 +1,193 @@
+import hashlib
+from functools import wraps
+
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.http import etag, require_safe
+
+from core.query_budget import query_budget
+from .feeds import get_feed_posts
+from .models import Group, Post, User
+from .page_cache import (GROUPS_SCOPE, INDEX_SCOPE, author_scope,
+                         cache_versioned_page, get_versions, group_scope)
+from .paginators import CursorPaginator
+from .thumbnails import attach_thumbnails, picture
+from .timelines import TimelinePaginator, timeline_entries
+
+
+LIMIT_POSTS = 10
+MAX_LIMIT = 100
+
+
+def image(post):
+    if not post.image:
+        return None
+    data = picture(post)
+    return {
+        'url': data['src'],
+        'width': data['width'],
+        'height': data['height'],
+    }
+
+
+POST_FIELDS = {
+    'id': lambda post: post.id,
+    'url': lambda post: reverse('posts:post_detail', args=[post.id]),
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'updated': lambda post: post.updated.isoformat(),
+    'author': lambda post: post.author.username,
+    'author_name': lambda post: post.author.get_full_name(),
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': image,
+}
+DETAIL_FIELDS = {
+    **POST_FIELDS,
+    'comments_count': lambda post: post.comments_count,
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_view(view):
+    """Только GET и HEAD; ошибки параметров отдаются как JSON с 400."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as exception:
+            return error(str(exception), 400)
+    return wrapper
+
+
+def get_fields(request, available):
+    """Поля ответа из параметра fields=id,text; без него отдаются все."""
+    value = request.GET.get('fields')
+    if not value:
+        return list(available)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', LIMIT_POSTS))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def serialize(post, fields, available=POST_FIELDS):
+    return {name: available[name](post) for name in fields}
+
+
+def feed_response(request, posts, paginator_class=CursorPaginator):
+    """Страница ленты по курсору: записи, курсоры соседних страниц."""
+    fields = get_fields(request, POST_FIELDS)
+    paginator = paginator_class(posts, get_limit(request))
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    if 'image' in fields:
+        attach_thumbnails(page_obj.object_list)
+    return JsonResponse({
+        'results': [serialize(post, fields) for post in page_obj],
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+    })
+
+
+def content_etag(view):
+    """ETag по хешу тела ответа для лент, у которых нет версий в кэше.
+
+    Запрос все равно выполняется, но совпавший If-None-Match получает
+    304 без тела.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        response['ETag'] = quote_etag(
+            hashlib.md5(response.content).hexdigest())
+        return get_conditional_response(
+            request, etag=response['ETag'], response=response) or response
+    return wrapper
+
+
+@api_view
+@cache_versioned_page(lambda request: [INDEX_SCOPE, GROUPS_SCOPE])
+@query_budget(3)
+def index(request):
+    return feed_response(request, get_feed_posts())
+
+
+@api_view
+@cache_versioned_page(
+    lambda request, slug: [group_scope(slug), GROUPS_SCOPE])
+@query_budget(4)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error('Группа не найдена', 404)
+    return feed_response(request, get_feed_posts(group=group))
+
+
+@api_view
+@cache_versioned_page(
+    lambda request, username: [author_scope(username), GROUPS_SCOPE])
+@query_budget(4)
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error('Автор не найден', 404)
+    return feed_response(request, get_feed_posts(author=author))
+
+
+@api_view
+@content_etag
+@query_budget(5)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация', 401)
+    response = feed_response(
+        request, timeline_entries(request.user), TimelinePaginator)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def post_detail_etag(request, post_id):
+    state = Post.objects.filter(id=post_id).values_list(
+        'updated', 'comments_count', 'author__username').first()
+    if state is None:
+        return None
+    updated, comments_count, username = state
+    versions = get_versions([author_scope(username), GROUPS_SCOPE])
+    state = '-'.join(str(part) for part in (
+        updated.timestamp(), comments_count, *versions,
+        request.GET.get('fields', '')))
+    return hashlib.md5(state.encode()).hexdigest()
+
+
+@api_view
+@etag(post_detail_etag)
+@query_budget(3)
+def post_detail(request, post_id):
+    fields = get_fields(request, DETAIL_FIELDS)
+    post = Post.objects.select_related('author', 'group').filter(
+        id=post_id).first()
+    if post is None:
+        return error('Пост не найден', 404)
+    if 'image' in fields:
+        attach_thumbnails([post])
+    return JsonResponse(serialize(post, fields, DETAIL_FIELDS))
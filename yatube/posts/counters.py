@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+BATCH_SIZE = 1000
+
+
+def change(queryset, **deltas):
+    """Атомарно изменить счетчики одним UPDATE ... SET x = x + delta.
+
+    Счетчик не опускается ниже нуля, даже если успел разойтись с данными.
+    """
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def change_author(user_id, **deltas):
+    """Изменить счетчики автора; пропавшую строку пересчитать заново.
+
+    Новая строка заполняется подсчетом по данным, в которых изменение
+    уже есть, поэтому delta к ней не прибавляется. Для уменьшений строка
+    не создается: так же уменьшения приходят при каскадном удалении
+    пользователя, когда его счетчики уже удалены.
+    """
+    if change(AuthorStats.objects.filter(user_id=user_id), **deltas):
+        return
+    if any(delta > 0 for delta in deltas.values()):
+        for _ in recount_authors(ids=[user_id]):
+            pass
+
+
+def change_group(group_id, delta):
+    if group_id:
+        change(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def change_post(post_id, delta):
+    change(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def count_by(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids}).order_by().values(
+            field).annotate(total=Count('pk')).values_list(field, 'total')
+    )
+
+
+def batches(queryset, batch_size):
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        page = ids if last is None else ids.filter(pk__gt=last)
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def chunks(ids, size):
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def recount_authors(batch_size=BATCH_SIZE, ids=None):
+    """Пересчитать счетчики всех авторов или только авторов из ids."""
+    if ids is None:
+        pages = batches(User.objects.all(), batch_size)
+    else:
+        pages = chunks(ids, batch_size)
+    for batch in pages:
+        posts = count_by(Post.objects.all(), 'author_id', batch)
+        followers = count_by(Follow.objects.all(), 'author_id', batch)
+        following = count_by(Follow.objects.all(), 'user_id', batch)
+        stats = [
+            AuthorStats(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                followers_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+            )
+            for user_id in batch
+        ]
+        with transaction.atomic():
+            AuthorStats.objects.bulk_create(stats, ignore_conflicts=True)
+            AuthorStats.objects.bulk_update(
+                stats,
+                ['posts_count', 'followers_count', 'following_count'],
+            )
+        yield len(batch)
+
+
+def recount_groups(batch_size=BATCH_SIZE, ids=None):
+    if ids is None:
+        pages = batches(Group.objects.all(), batch_size)
+    else:
+        pages = chunks(ids, batch_size)
+    for batch in pages:
+        posts = count_by(Post.objects.all(), 'group_id', batch)
+        groups = [
+            Group(pk=group_id, posts_count=posts.get(group_id, 0))
+            for group_id in batch
+        ]
+        with transaction.atomic():
+            Group.objects.bulk_update(groups, ['posts_count'])
+        yield len(batch)
+
+
+def recount_posts(batch_size=BATCH_SIZE):
+    for batch in batches(Post.objects.all(), batch_size):
+        comments = count_by(Comment.objects.all(), 'post_id', batch)
+        posts = [
+            Post(pk=post_id, comments_count=comments.get(post_id, 0))
+            for post_id in batch
+        ]
+        with transaction.atomic():
+            Post.objects.bulk_update(posts, ['comments_count'])
+        yield len(batch)
@@ -0,0 +1,93 @@
+import csv
+import json
+from datetime import datetime
+
+from .models import Comment, Follow, Post
+
+
+CHUNK_SIZE = 2000
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+EXPORTS = {
+    'posts': (Post, (
+        ('id', 'id'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('text', 'text'),
+        ('pub_date', 'pub_date'),
+        ('updated', 'updated'),
+        ('image', 'image'),
+        ('comments_count', 'comments_count'),
+    )),
+    'comments': (Comment, (
+        ('id', 'id'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('text', 'text'),
+        ('created', 'created'),
+    )),
+    'follows': (Follow, (
+        ('id', 'id'),
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    )),
+}
+
+
+OWNERS = {
+    'posts': 'author',
+    'comments': 'author',
+    'follows': 'user',
+}
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу отдает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(kind, chunk_size=CHUNK_SIZE, user=None):
+    """Строки выгрузки в порядке id: кортежи значений колонок.
+
+    С user выгружаются только его записи: посты и комментарии, которые
+    он написал, и подписки, которые он оформил.
+
+    Поля авторов и групп подтягиваются соединением в том же запросе,
+    а iterator() читает результат пачками по chunk_size, не сохраняя
+    объекты в кэше queryset, поэтому память не растет с размером
+    выгрузки.
+    """
+    model, columns = EXPORTS[kind]
+    queryset = model.objects.all()
+    if user is not None:
+        queryset = queryset.filter(**{OWNERS[kind]: user})
+    queryset = queryset.order_by('id').values_list(
+        *[lookup for _, lookup in columns])
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def prepare(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def export_lines(kind, export_format, chunk_size=CHUNK_SIZE, user=None):
+    """Выгрузка построчно в JSONL или CSV (с заголовком)."""
+    names = [name for name, _ in EXPORTS[kind][1]]
+    rows = export_rows(kind, chunk_size, user)
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(names)
+        for row in rows:
+            yield writer.writerow([prepare(value) for value in row])
+        return
+    for row in rows:
+        yield json.dumps(
+            dict(zip(names, map(prepare, row))), ensure_ascii=False) + '\n'
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+
+
+COUNT_TIMEOUT = 60 * 5
+GLOBAL_FEED = 'global'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def author_feed(author_id):
+    return f'author:{author_id}'
+
+
+def follow_feed(user_id):
+    return f'follow:{user_id}'
+
+
+def count_key(feed):
+    return f'feed_count:{feed}'
+
+
+def get_count(feed, queryset):
+    """Количество записей в ленте из кэша.
+
+    При промахе значение пересчитывается через COUNT(*) и живет не дольше
+    COUNT_TIMEOUT, поэтому пропущенное сигналом изменение исправится само.
+    """
+    key = count_key(feed)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.add(key, count, COUNT_TIMEOUT)
+    return count
+
+
+def adjust(feeds, delta):
+    for feed in feeds:
+        try:
+            cache.incr(count_key(feed), delta)
+        except ValueError:
+            pass
+
+
+def forget(feeds):
+    cache.delete_many([count_key(feed) for feed in feeds])
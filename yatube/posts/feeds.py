@@ -0,0 +1,26 @@
+from .models import Post
+
+
+CARD_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'updated',
+    'image',
+    'image_width',
+    'image_height',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__slug',
+)
+
+
+def get_feed_posts(**filters):
+    """Queryset ленты с полями, которые читает карточка поста.
+
+    Автор и группа подтягиваются тем же запросом, поэтому страница
+    ленты не порождает запросов на каждый пост.
+    """
+    return Post.objects.filter(**filters).select_related(
+        'author', 'group').only(*CARD_FIELDS)
@@ -1,4 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+
+from . import images
 from .models import Post, Comment
 
 
@@ -7,6 +11,42 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Проверить разрешение картинки и уменьшить слишком большую.
+
+        Размеры берутся из заголовка файла, полное декодирование
+        не нужно. JPEG уменьшается без декодирования в полном размере,
+        остальные форматы декодируются целиком, и для них предел ниже.
+        """
+        image = self.cleaned_data.get('image')
+        if not image or not hasattr(image, 'image'):
+            return image
+        width, height = image.image.size
+        max_pixels = settings.POST_IMAGE_MAX_PIXELS
+        if image.image.format != 'JPEG':
+            max_pixels = settings.POST_IMAGE_MAX_DECODED_PIXELS
+        if width * height > max_pixels:
+            raise forms.ValidationError(
+                'Слишком большое разрешение картинки.',
+                code='too_many_pixels')
+        if max(width, height) > settings.POST_IMAGE_MAX_SIDE:
+            return images.downsize(image, settings.POST_IMAGE_MAX_SIDE)
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = self.files.get(self.add_prefix('image'))
+        if upload is not None and upload.size > settings.UPLOAD_MAX_SIZE:
+            # Файл записан не целиком, поэтому вместо ошибки «не картинка»
+            # сообщаем настоящую причину.
+            self.errors.pop('image', None)
+            self.add_error('image', forms.ValidationError(
+                'Файл больше %(size)s.',
+                code='file_too_large',
+                params={'size': filesizeformat(settings.UPLOAD_MAX_SIZE)},
+            ))
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,86 @@
+import hashlib
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+}
+
+
+def read_metadata(file):
+    """Размеры, формат и SHA-256 картинки за одно чтение файла.
+
+    PIL читает только заголовок, поэтому картинка целиком не
+    декодируется. Позиция в файле возвращается в начало.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        image_format = image.format or ''
+    file.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_format': image_format,
+        'image_hash': digest.hexdigest(),
+    }
+
+
+def fill_metadata(post):
+    """Записать в пост метаданные его картинки или очистить их.
+
+    Если файл не читается, поля остаются пустыми: шаблоны тогда
+    обходятся без размеров.
+    """
+    metadata = {
+        'image_width': None,
+        'image_height': None,
+        'image_format': '',
+        'image_hash': '',
+    }
+    image = post.image
+    if image:
+        try:
+            if image._committed:
+                image.open('rb')
+            metadata = read_metadata(image.file)
+        except (OSError, SuspiciousFileOperation):
+            pass
+        finally:
+            if image._committed:
+                image.close()
+    for field, value in metadata.items():
+        setattr(post, field, value)
+
+
+def downsize(file, max_side):
+    """Уменьшить картинку так, чтобы большая сторона была не больше max_side.
+
+    JPEG сразу декодируется в уменьшенном масштабе (draft). Остальные
+    форматы декодируются целиком и только потом сжимаются через
+    reduce(), поэтому форма пропускает их лишь до
+    POST_IMAGE_MAX_DECODED_PIXELS. Результат пишется во временный файл,
+    который уходит на диск, когда перерастает
+    FILE_UPLOAD_MAX_MEMORY_SIZE.
+    """
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    file.seek(0)
+    with Image.open(file) as image:
+        image_format = image.format
+        image.thumbnail((max_side, max_side), reducing_gap=2.0)
+        image.save(output, image_format,
+                   **SAVE_OPTIONS.get(image_format, {}))
+    size = output.tell()
+    output.seek(0)
+    return UploadedFile(output, file.name, file.content_type, size)
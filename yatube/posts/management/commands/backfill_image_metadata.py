@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.counters import BATCH_SIZE, batches
+from posts.models import Post
+
+
+FIELDS = ['image_width', 'image_height', 'image_format', 'image_hash']
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, формат и хеш картинок у старых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько постов обновлять одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        missing = Post.objects.exclude(image='').filter(image_hash='')
+        total = 0
+        for batch in batches(missing, options['batch_size']):
+            posts = list(Post.objects.filter(pk__in=batch).only(
+                'id', 'image', *FIELDS))
+            for post in posts:
+                images.fill_metadata(post)
+            Post.objects.bulk_update(posts, FIELDS)
+            total += len(posts)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано постов: {total}'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from posts import exporting
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии или подписки в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exporting.EXPORTS))
+        parser.add_argument(
+            '--format', choices=exporting.FORMATS, default='jsonl',
+            help='Формат выгрузки'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, «-» для стандартного вывода'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=exporting.CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз'
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        stream = (self.stdout if output == '-'
+                  else open(output, 'w', encoding='utf-8', newline=''))
+        total = 0
+        try:
+            for line in exporting.export_lines(
+                    options['kind'], options['format'],
+                    options['chunk_size']):
+                stream.write(line)
+                total += 1
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'Выгружено строк: {total}'))
@@ -0,0 +1,65 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importing
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты из файла JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с постами, «-» для стандартного ввода')
+        parser.add_argument(
+            '--format', choices=importing.FORMATS,
+            help='Формат файла (по умолчанию по расширению)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=importing.BATCH_SIZE,
+            help='Сколько постов вставлять в одной транзакции'
+        )
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Создавать неизвестных авторов'
+        )
+        parser.add_argument(
+            '--with-signals', action='store_true',
+            help='Сохранять посты по одному со всеми сигналами (медленно)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format']
+        if input_format is None:
+            if path.endswith('.csv'):
+                input_format = 'csv'
+            elif path.endswith('.jsonl') or path == '-':
+                input_format = 'jsonl'
+            else:
+                raise CommandError('Укажите формат файла через --format')
+        importer = importing.PostImporter(
+            batch_size=options['batch_size'],
+            create_authors=options['create_authors'],
+            signals=options['with_signals'],
+        )
+        stream = (sys.stdin if path == '-'
+                  else open(path, encoding='utf-8', newline=''))
+        started = time.monotonic()
+        try:
+            rows = importing.read_rows(stream, input_format)
+            for errors in importer.run(rows):
+                for number, error in errors:
+                    self.stderr.write(f'Строка {number}: {error}')
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Импортировано {importer.imported} постов, '
+                    f'{importer.imported / max(elapsed, 1e-6):.0f} в секунду')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с: '
+            f'импортировано {importer.imported}, '
+            f'пропущено {importer.skipped}'))
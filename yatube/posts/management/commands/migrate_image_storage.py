@@ -0,0 +1,41 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.storage import is_content_addressed
+from posts import page_cache, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Переносит картинки постов в хранилище с именами по хешу'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help='Удалить старые файлы после переноса'
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True).distinct()
+        moved = missing = 0
+        for name in list(names):
+            if is_content_addressed(name):
+                continue
+            if not default_storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            with default_storage.open(name) as content:
+                new_name = default_storage.save(name, content)
+            Post.objects.filter(image=name).update(
+                image=new_name, updated=timezone.now())
+            thumbnails.schedule(new_name)
+            if options['delete_originals']:
+                default_storage.delete(name)
+            moved += 1
+        if moved:
+            page_cache.bump(page_cache.GROUPS_SCOPE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, не найдено: {missing}'))
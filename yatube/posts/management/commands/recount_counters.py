@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики постов, групп и авторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=counters.BATCH_SIZE,
+            help='Сколько объектов пересчитывать в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        for name, recount in (
+            ('авторов', counters.recount_authors),
+            ('групп', counters.recount_groups),
+            ('постов', counters.recount_posts),
+        ):
+            total = 0
+            for done in recount(options['batch_size']):
+                total += done
+            self.stdout.write(f'Пересчитано {name}: {total}')
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,95 @@
+import heapq
+from functools import partial
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .feeds import get_feed_posts
+from .models import Follow, Post
+
+
+RECENT_POSTS = 100
+RECENT_TIMEOUT = 60 * 60 * 24
+
+
+def recent_key(author_id):
+    return f'recent_posts:{author_id}'
+
+
+def get_recent_posts(author_ids):
+    """Последние RECENT_POSTS пар (pub_date, id) каждого автора.
+
+    Списки берутся из кэша, недостающие добираются одним запросом.
+    """
+    keys = {recent_key(author_id): author_id for author_id in author_ids}
+    recent = {
+        keys[key]: entries for key, entries in cache.get_many(keys).items()
+    }
+    missing = [author_id for author_id in author_ids
+               if author_id not in recent]
+    if missing:
+        fetched = {author_id: [] for author_id in missing}
+        for author_id, pub_date, post_id in fetch_recent_posts(missing):
+            fetched[author_id].append((pub_date, post_id))
+        cache.set_many(
+            {recent_key(author_id): entries
+             for author_id, entries in fetched.items()},
+            RECENT_TIMEOUT,
+        )
+        recent.update(fetched)
+    return recent
+
+
+def fetch_recent_posts(author_ids):
+    sql = (
+        'SELECT id, author_id, pub_date FROM ('
+        ' SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+        '  PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+        ' ) AS position FROM {table} WHERE author_id IN ({placeholders})'
+        ') WHERE position <= %s ORDER BY author_id, pub_date DESC, id DESC'
+    ).format(
+        table=Post._meta.db_table,
+        placeholders=', '.join(['%s'] * len(author_ids)),
+    )
+    for post in Post.objects.raw(sql, [*author_ids, RECENT_POSTS]):
+        yield post.author_id, post.pub_date, post.id
+
+
+def forget_author(author_id):
+    """Сбросить кэш свежих постов автора до следующего чтения из базы.
+
+    Список не дописывается на месте: чтение и запись в кэш не атомарны,
+    и параллельные посты одного автора затирали бы друг друга. После
+    коммита ключ сбрасывается еще раз, чтобы чтение, успевшее до коммита,
+    не оставило в кэше список без нового поста.
+    """
+    cache.delete(recent_key(author_id))
+    transaction.on_commit(partial(cache.delete, recent_key(author_id)))
+
+
+class MergedFollowFeed:
+    """Лента подписок, собранная k-way слиянием списков авторов.
+
+    Вместо соединения с Follow берутся свежие посты каждого автора из кэша
+    и сливаются через кучу. Лента ограничена RECENT_POSTS записями на
+    автора. Объект реализует len() и срезы, поэтому его можно отдать
+    Paginator так же, как queryset.
+    """
+
+    def __init__(self, user):
+        author_ids = Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True)
+        self.recent = list(get_recent_posts(list(author_ids)).values())
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.recent)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        merged = heapq.merge(*self.recent, reverse=True)
+        ids = [post_id for _, post_id in islice(
+            merged, index.start, index.stop)]
+        posts = get_feed_posts(id__in=ids).in_bulk()
+        return [posts[post_id] for post_id in ids if post_id in posts]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:39
+
+from django.db import migrations, models
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    """Удалить повторные подписки и пересчитать счетчики их участников.
+
+    0017 уже посчитала повторы в followers_count и following_count.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    keep = Follow.objects.values('user', 'author').annotate(
+        first=models.Min('id')).values_list('first', flat=True)
+    duplicates = Follow.objects.exclude(id__in=list(keep))
+    users = set()
+    for user_id, author_id in duplicates.values_list('user_id', 'author_id'):
+        users.update((user_id, author_id))
+    duplicates.delete()
+    for user_id in users:
+        AuthorStats.objects.filter(user_id=user_id).update(
+            followers_count=Follow.objects.filter(author_id=user_id).count(),
+            following_count=Follow.objects.filter(user_id=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created', '-id'], name='posts_comme_post_id_bbe34c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='posts_post_group_i_6a7ae9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='posts_post_author__075f1d_idx'),
+        ),
+        migrations.RunPython(
+            drop_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
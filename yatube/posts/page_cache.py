@@ -0,0 +1,150 @@
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+PAGE_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+EARLY_REFRESH_BETA = 1.0
+INDEX_SCOPE = 'index'
+GROUPS_SCOPE = 'groups'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def version_key(scope):
+    return f'page_version:{scope}'
+
+
+def new_version():
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    """Текущие версии областей кэша, отсутствующие создаются.
+
+    Начальная версия берется из часов, поэтому вытесненный из кэша
+    счетчик не вернет к жизни страницы со старой версией.
+    """
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(version_key(scope))
+        except ValueError:
+            cache.set(version_key(scope), new_version(), None)
+
+
+def request_key(name, request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    user_id = request.user.pk or 0
+    return f'{name}:{user_id}:{path}'
+
+
+def should_refresh(entry):
+    """Вероятностное раннее обновление (XFetch).
+
+    Чем ближе срок жизни записи и чем дольше она строилась, тем выше шанс,
+    что очередной запрос перестроит ее заранее, не дожидаясь промаха.
+    """
+    jitter = -entry['delta'] * EARLY_REFRESH_BETA * math.log(
+        1 - random.random())
+    return time.time() + jitter >= entry['expires']
+
+
+def wait_for_entry(key):
+    """Подождать страницу, которую строит запрос с блокировкой.
+
+    Возвращает None, если блокировку сняли без записи в кэш или ожидание
+    заняло больше LOCK_WAIT секунд.
+    """
+    lock = f'{key}:lock'
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        found = cache.get_many([key, lock])
+        if key in found:
+            return found[key]
+        if lock not in found:
+            return None
+    return None
+
+
+def cache_versioned_page(scopes, timeout=PAGE_TIMEOUT):
+    """Кэширует GET-ответ представления под ключом с версиями областей.
+
+    scopes(request, *args, **kwargs) возвращает области, от которых
+    зависит страница. Сигналы увеличивают версию области при записи,
+    после чего следующий запрос строит страницу заново, а старые записи
+    просто доживают свой срок.
+
+    Версии служат и ETag страницы: запрос с совпавшим If-None-Match
+    получает 304 без обращения к ленте и шаблонам.
+
+    Страницу перестраивает один запрос, взявший блокировку в кэше.
+    Остальные в это время получают последнюю построенную копию,
+    даже если ее версия уже устарела, а если копии нет, недолго ждут
+    готовую страницу и только потом строят ее сами.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            name = request_key(view.__name__, request)
+            version = '.'.join(
+                str(version) for version in
+                get_versions(scopes(request, *args, **kwargs)))
+            etag = quote_etag(f'{version}-{request.user.pk or 0}')
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+            key = f'page:{version}:{name}'
+            stale_key = f'page_stale:{name}'
+            entry = cache.get(key)
+            if entry is not None and not should_refresh(entry):
+                return entry['response']
+            if not cache.add(f'{key}:lock', True, LOCK_TIMEOUT):
+                stale = entry or cache.get(stale_key) or wait_for_entry(key)
+                if stale is not None:
+                    return stale['response']
+                return view(request, *args, **kwargs)
+            try:
+                started = time.time()
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    response['ETag'] = etag
+                    finished = time.time()
+                    entry = {
+                        'response': response,
+                        'delta': finished - started,
+                        'expires': finished + timeout,
+                    }
+                    cache.set_many({key: entry, stale_key: entry}, timeout)
+            finally:
+                cache.delete(f'{key}:lock')
+            return response
+        return wrapper
+    return decorator
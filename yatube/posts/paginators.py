@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import feed_counts
+
+
+CURSOR_ORDERING = ('-pub_date', '-id')
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def pack_cursor(direction, values):
+    raw = json.dumps([direction, values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def unpack_cursor(cursor, size):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    direction, values = json.loads(raw.decode())
+    if direction not in (NEXT, PREVIOUS) or len(values) != size:
+        raise ValueError('Некорректный курсор')
+    return direction, values
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берет размер ленты из кэша счетчиков.
+
+    Счетчик может немного отставать, поэтому записи страницы выбираются
+    срезом без оглядки на него: неточным бывает только число ссылок.
+    """
+
+    def __init__(self, object_list, per_page, feed, **kwargs):
+        self.feed = feed
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        return feed_counts.get_count(self.feed, self.object_list)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+class CursorPage(Page):
+    """Страница, которая знает курсоры соседних страниц вместо номеров."""
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по набору полей, по умолчанию (pub_date, id).
+
+    Страница выбирается условием по ключу последней записи, поэтому
+    глубокие страницы стоят столько же, сколько первая, и COUNT(*)
+    не выполняется.
+    """
+
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, ordering=CURSOR_ORDERING):
+        self.ordering = ordering
+        super().__init__(object_list.order_by(*ordering), per_page)
+
+    def _fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, direction, obj):
+        values = [
+            self.object_list.model._meta.get_field(name).value_to_string(obj)
+            for name in self._fields()
+        ]
+        return pack_cursor(direction, values)
+
+    def decode_cursor(self, cursor):
+        fields = self._fields()
+        direction, values = unpack_cursor(cursor, len(fields))
+        model = self.object_list.model
+        return direction, [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(fields, values)
+        ]
+
+    def _keyset_filter(self, values, backwards):
+        """Условие «после ключа» для сортировки self.ordering.
+
+        Нестрогая граница по первому полю вынесена вперед: без нее SQLite
+        не видит диапазона индекса в OR и читает индекс с начала ленты.
+        """
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') != backwards else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[index]})
+            for previous, value in zip(self._fields()[:index], values):
+                step &= Q(**{previous: value})
+            condition |= step
+        first = self.ordering[0]
+        lookup = 'lte' if first.startswith('-') != backwards else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def _fetch(self, values, backwards, limit):
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(values, backwards))
+        if backwards:
+            queryset = queryset.reverse()
+        return list(queryset[:limit])
+
+    def get_page(self, cursor):
+        """Вернуть страницу после (или до) записи, закодированной в курсоре.
+
+        Некорректный или пустой курсор ведет на первую страницу.
+        """
+        try:
+            direction, values = self.decode_cursor(cursor or '')
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            direction, values = NEXT, None
+        backwards = direction == PREVIOUS
+        rows = self._fetch(values, backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(PREVIOUS, rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,165 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .feeds import get_feed_posts
+from .paginators import CursorPaginator, pack_cursor, unpack_cursor
+
+
+FTS_TABLE = 'posts_post_fts'
+SNIPPET_TOKENS = 16
+ELLIPSIS = '…'
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+FTS_SCHEMA = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"text, content='posts_post', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+)
+FTS_TRIGGERS = (
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert '
+    f'AFTER INSERT ON posts_post BEGIN '
+    f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text); '
+    f'END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete '
+    f'AFTER DELETE ON posts_post BEGIN '
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f'END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update '
+    f'AFTER UPDATE OF text ON posts_post BEGIN '
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text); '
+    f'END',
+)
+
+
+def enabled(using=None):
+    """Полнотекстовый индекс есть только в SQLite, иначе ищем через LIKE."""
+    return (using or connection).vendor == 'sqlite'
+
+
+def install(using):
+    """Создать индекс FTS5 с триггерами и заполнить его текущими постами."""
+    if not enabled(using):
+        return
+    with using.cursor() as cursor:
+        for statement in FTS_SCHEMA + FTS_TRIGGERS:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(using):
+    if not enabled(using):
+        return
+    with using.cursor() as cursor:
+        for action in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{action}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def restore_triggers(using):
+    """Вернуть триггеры, если миграция пересоздала таблицу постов.
+
+    SQLite меняет схему через копию таблицы, и триггеры старой таблицы
+    пропадают вместе с ней.
+    """
+    if not enabled(using):
+        return
+    if FTS_TABLE not in using.introspection.table_names():
+        return
+    with using.cursor() as cursor:
+        for statement in FTS_TRIGGERS:
+            cursor.execute(statement)
+
+
+def build_query(text):
+    """Превратить ввод пользователя в запрос FTS5: все слова, последнее
+    как префикс. Операторы FTS5 из ввода не передаются."""
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def matching(queryset, text):
+    """Отфильтровать посты по индексу FTS5 без ранжирования."""
+    query = build_query(text)
+    if not query:
+        return queryset.none()
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [query]))
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-пагинация результатов поиска по (релевантность bm25, id).
+
+    Посты страницы получают атрибуты rank и snippet с подсвеченными
+    совпадениями.
+    """
+
+    def __init__(self, query, per_page):
+        self.query = query
+        super().__init__(get_feed_posts(), per_page)
+
+    def encode_cursor(self, direction, obj):
+        return pack_cursor(direction, [obj.rank, obj.id])
+
+    def decode_cursor(self, cursor):
+        direction, (rank, post_id) = unpack_cursor(cursor, 2)
+        return direction, [float(rank), int(post_id)]
+
+    def _fetch(self, values, backwards, limit):
+        sql = (
+            f'SELECT rowid, bm25({FTS_TABLE}), '
+            f'snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [MARK_START, MARK_END, ELLIPSIS, SNIPPET_TOKENS, self.query]
+        if values is not None:
+            sign = '<' if backwards else '>'
+            sql += f' AND (bm25({FTS_TABLE}), rowid) {sign} (%s, %s)'
+            params += values
+        order = 'DESC' if backwards else 'ASC'
+        sql += f' ORDER BY 2 {order}, 1 {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        posts = self.object_list.in_bulk([post_id for post_id, *_ in rows])
+        found = []
+        for post_id, rank, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                found.append(post)
+        return found
+
+
+def search_page(text, per_page, cursor=None):
+    """Страница результатов поиска: по индексу FTS5 или через LIKE."""
+    if enabled():
+        query = build_query(text)
+        if not query:
+            return None
+        paginator = SearchPaginator(query, per_page)
+    else:
+        paginator = CursorPaginator(
+            get_feed_posts(text__icontains=text), per_page)
+    return paginator.get_page(cursor)
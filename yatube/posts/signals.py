@@ -0,0 +1,175 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import tasks
+
+from . import (counters, feed_counts, images, merge_feed, page_cache,
+               thumbnails, timelines)
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+
+def post_feeds(post, group_id):
+    feeds = [feed_counts.GLOBAL_FEED, feed_counts.author_feed(post.author_id)]
+    if group_id:
+        feeds.append(feed_counts.group_feed(group_id))
+    return feeds
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image').first() or (None, None))
+
+
+@receiver(pre_save, sender=Post)
+def fill_image_metadata(sender, instance, **kwargs):
+    image = instance.image
+    saved_image = getattr(instance, '_saved_image', None)
+    if not image._committed or image.name != saved_image:
+        images.fill_metadata(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        feed_counts.adjust(post_feeds(instance, instance.group_id), 1)
+        tasks.enqueue('posts.fan_out', instance.pk)
+        merge_feed.forget_author(instance.author_id)
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if saved_group_id != instance.group_id:
+        if saved_group_id:
+            feed_counts.adjust([feed_counts.group_feed(saved_group_id)], -1)
+        if instance.group_id:
+            feed_counts.adjust(
+                [feed_counts.group_feed(instance.group_id)], 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    feed_counts.adjust(post_feeds(instance, instance.group_id), -1)
+    tasks.enqueue('posts.forget_follow_counts', instance.author_id)
+    merge_feed.forget_author(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follow_feed_count(sender, instance, **kwargs):
+    feed_counts.forget([feed_counts.follow_feed(instance.user_id)])
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    if created:
+        tasks.enqueue(
+            'posts.backfill_timeline', instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timelines.drop(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Group)
+def forget_group_feed_count(sender, instance, **kwargs):
+    feed_counts.forget([feed_counts.group_feed(instance.pk)])
+
+
+def bump_post_pages(post, *group_ids):
+    slugs = Group.objects.filter(
+        pk__in=[group_id for group_id in group_ids if group_id]
+    ).values_list('slug', flat=True)
+    page_cache.bump(
+        page_cache.INDEX_SCOPE,
+        page_cache.author_scope(post.author.username),
+        *[page_cache.group_scope(slug) for slug in slugs],
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_pages_for_post(sender, instance, **kwargs):
+    bump_post_pages(
+        instance,
+        instance.group_id,
+        getattr(instance, '_saved_group_id', None),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_pages_for_comment(sender, instance, **kwargs):
+    bump_post_pages(instance.post, instance.post.group_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_pages_for_group(sender, instance, **kwargs):
+    page_cache.bump(page_cache.GROUPS_SCOPE)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_pages_for_follow(sender, instance, **kwargs):
+    page_cache.bump(page_cache.author_scope(instance.author.username))
+
+
+@receiver(post_save, sender=get_user_model())
+def create_author_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_author_posts(sender, instance, created, **kwargs):
+    if created:
+        counters.change_author(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if saved_group_id != instance.group_id:
+        counters.change_group(saved_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_author_posts(sender, instance, **kwargs):
+    counters.change_author(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.change_author(instance.author_id, followers_count=1)
+        counters.change_author(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.change_author(instance.author_id, followers_count=-1)
+    counters.change_author(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def build_thumbnails(sender, instance, created, **kwargs):
+    name = instance.image.name
+    if name and name != getattr(instance, '_saved_image', None):
+        transaction.on_commit(partial(thumbnails.schedule, name))
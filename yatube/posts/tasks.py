@@ -0,0 +1,29 @@
+from core.tasks import task
+
+from . import thumbnails, timelines
+from .models import Follow, Post
+
+
+@task('posts.build_thumbnails')
+def build_thumbnails(name):
+    thumbnails.build(name)
+
+
+@task('posts.fan_out')
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'id', 'author_id', 'pub_date').first()
+    if post is not None:
+        timelines.fan_out(post)
+
+
+@task('posts.forget_follow_counts')
+def forget_follow_counts(author_id):
+    timelines.forget_follower_counts(author_id)
+
+
+@task('posts.backfill_timeline')
+def backfill_timeline(user_id, author_id):
+    """Пока задача ждала в очереди, от автора могли уже отписаться."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timelines.backfill(user_id, author_id)
@@ -0,0 +1,12 @@
+from django import template
+
+from posts import thumbnails
+
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_image(post):
+    """Картинка поста с вариантами нескольких ширин и форматов."""
+    return thumbnails.picture(post)
@@ -0,0 +1,97 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class FeedApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {number}', group=self.group)
+            for number in range(3)
+        ]
+
+    def test_feed_is_paginated_by_cursor(self):
+        """Лента отдается страницами по курсору от новых постов к старым."""
+        url = reverse('posts:api_index')
+        first = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual([post['id'] for post in first['results']],
+                         [self.posts[2].id, self.posts[1].id])
+        self.assertIsNone(first['previous_cursor'])
+        second = self.client.get(
+            url, {'limit': 2, 'cursor': first['next_cursor']}).json()
+        self.assertEqual([post['id'] for post in second['results']],
+                         [self.posts[0].id])
+        self.assertIsNone(second['next_cursor'])
+        post = first['results'][0]
+        self.assertEqual(post['author'], 'author')
+        self.assertEqual(post['author_name'], 'Лев Толстой')
+        self.assertEqual(post['group'], 'api')
+        self.assertEqual(post['url'], reverse(
+            'posts:post_detail', args=[self.posts[2].id]))
+
+    def test_sparse_fields(self):
+        """Параметр fields оставляет в ответе только перечисленные поля."""
+        for url in (reverse('posts:api_group_list', args=['api']),
+                    reverse('posts:api_profile', args=['author'])):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'fields': 'id,text'})
+                self.assertEqual(set(response.json()['results'][0]),
+                                 {'id', 'text'})
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['error'])
+
+    def test_feed_etag(self):
+        """Повторный запрос с ETag получает 304, пока лента не изменилась."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['text'], 'Новый')
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и отдается со своим ETag."""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.UNAUTHORIZED)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 3)
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_post_detail(self):
+        """Пост отдается с числом комментариев и ETag."""
+        post = self.posts[0]
+        url = reverse('posts:api_post_detail', args=[post.id])
+        response = self.client.get(url, {'fields': 'id,comments_count'})
+        self.assertEqual(response.json(), {'id': post.id, 'comments_count': 0})
+        response = self.client.get(
+            url, {'fields': 'id,comments_count'},
+            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=[0]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(response.json(), {'error': 'Пост не найден'})
@@ -0,0 +1,79 @@
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from posts.page_cache import (INDEX_SCOPE, PAGE_TIMEOUT, bump,
+                              cache_versioned_page, should_refresh)
+
+
+class VersionedPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @cache_versioned_page(lambda request: [INDEX_SCOPE])
+        def view(request):
+            self.calls += 1
+            return HttpResponse(f'render {self.calls}')
+
+        self.view = view
+
+    def get(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        return self.view(request).content.decode()
+
+    def test_page_is_rebuilt_after_bump(self):
+        """Страница берется из кэша до увеличения версии области."""
+        self.assertEqual(self.get(), 'render 1')
+        self.assertEqual(self.get(), 'render 1')
+        bump(INDEX_SCOPE)
+        self.assertEqual(self.get(), 'render 2')
+
+    def test_stale_copy_served_while_rebuilding(self):
+        """Пока страницу строит другой запрос, отдается прежняя копия."""
+        self.assertEqual(self.get(), 'render 1')
+        bump(INDEX_SCOPE)
+        with patch('posts.page_cache.cache.add', return_value=False):
+            self.assertEqual(self.get(), 'render 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_request_waits_for_page_being_built(self):
+        """Без прежней копии запрос ждет страницу, которую строит другой."""
+        building, release = threading.Event(), threading.Event()
+
+        @cache_versioned_page(lambda request: [INDEX_SCOPE])
+        def view(request):
+            self.calls += 1
+            building.set()
+            release.wait(5)
+            return HttpResponse(f'render {self.calls}')
+
+        self.view = view
+        builder = threading.Thread(target=self.get)
+        builder.start()
+        building.wait(5)
+
+        def sleep(seconds):
+            release.set()
+            builder.join()
+
+        with patch('posts.page_cache.time.sleep', side_effect=sleep):
+            self.assertEqual(self.get(), 'render 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_early_refresh_near_expiry(self):
+        """Запись перестраивается заранее, когда срок жизни почти истек."""
+        entry = {'delta': 1.0, 'expires': time.time() + 0.5}
+        with patch('posts.page_cache.random.random', return_value=0.99):
+            self.assertTrue(should_refresh(entry))
+        with patch('posts.page_cache.random.random', return_value=0.0):
+            self.assertFalse(should_refresh(entry))
+        entry['expires'] = time.time() + PAGE_TIMEOUT
+        with patch('posts.page_cache.random.random', return_value=0.99):
+            self.assertFalse(should_refresh(entry))
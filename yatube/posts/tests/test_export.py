@@ -0,0 +1,83 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='export', description='Описание')
+        self.post = Post.objects.create(
+            author=self.author, text='Пост, "с кавычками"', group=group)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_command_writes_jsonl_and_csv(self):
+        """Команда выгружает данные построчно в JSONL и CSV."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'posts.csv')
+        call_command('export_data', 'posts', '--format', 'csv',
+                     '--output', path, '--chunk-size', '1',
+                     stdout=StringIO())
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], self.post.text)
+        self.assertEqual(rows[0]['group'], 'export')
+
+        output = StringIO()
+        call_command('export_data', 'follows', stdout=output)
+        self.assertEqual(
+            [json.loads(line) for line in output.getvalue().splitlines()],
+            [{'id': Follow.objects.get().id,
+              'user': 'reader', 'author': 'author'}])
+
+    def test_endpoint_streams_own_data(self):
+        """Выгрузка по HTTP идет потоком и содержит только свои записи."""
+        url = reverse('posts:export', args=['comments'])
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FOUND)
+
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertIn('comments.jsonl', response['Content-Disposition'])
+        rows = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['post'], self.post.id)
+        self.assertEqual(rows[0]['author'], 'reader')
+
+        response = self.client.get(
+            reverse('posts:export', args=['posts']), {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(b''.join(
+            response.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), 1)
+        response = self.client.get(reverse('posts:export', args=['users']))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+        self.client.force_login(self.author)
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), b'')
+        response = self.client.get(reverse('posts:export', args=['posts']))
+        rows = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.post.id])
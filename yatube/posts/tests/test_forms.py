@@ -1,11 +1,15 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 from posts.models import Group, Post
 
 
@@ -77,9 +81,11 @@ class PostFormsTests(TestCase):
         response = self.authorized_client.post(
             reverse('posts:post_create'), data=self.form_fields, follow=True)
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        digest = hashlib.sha256(self.small_gif).hexdigest()
+        image = f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
         self.assertTrue(Post.objects.filter(text=self.form_fields['text'],
                                             group=self.group.id,
-                                            image='posts/small.gif').exists()
+                                            image=image).exists()
                         )
         self.assertRedirects(response,
                              reverse(
@@ -103,6 +109,7 @@ class PostFormsTests(TestCase):
             group=self.group2,
         )
         post_0 = post_2
+        cache.clear()
         response_2 = self.authorized_client.get(
             reverse('posts:group_list', args=[PostFormsTests.group.slug]))
 
@@ -114,3 +121,64 @@ class PostFormsTests(TestCase):
                         )
         self.assertIn(post_1, response_0.context['page_obj'].object_list)
         self.assertNotIn(post_0, response_2.context['page_obj'].object_list)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader')
+        self.client.force_login(self.user)
+
+    def make_image(self, width, height, image_format='PNG'):
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), 'red').save(buffer, image_format)
+        extension = image_format.lower()
+        return SimpleUploadedFile(
+            f'picture.{extension}', buffer.getvalue(),
+            content_type=f'image/{extension}')
+
+    def create(self, image):
+        return self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image})
+
+    @override_settings(UPLOAD_MAX_SIZE=10)
+    def test_file_size_limit(self):
+        """Слишком большой файл отклоняется формой."""
+        response = self.create(self.make_image(4, 4))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 10\xa0байт.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_pixel_limit(self):
+        """Картинка с большим разрешением отклоняется."""
+        response = self.create(self.make_image(20, 10, 'JPEG'))
+        self.assertFormError(
+            response, 'form', 'image', 'Слишком большое разрешение картинки.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000,
+                       POST_IMAGE_MAX_DECODED_PIXELS=100)
+    def test_decoded_pixel_limit(self):
+        """Не-JPEG декодируется целиком, поэтому для него предел ниже."""
+        response = self.create(self.make_image(20, 10))
+        self.assertFormError(
+            response, 'form', 'image', 'Слишком большое разрешение картинки.')
+        self.create(self.make_image(20, 10, 'JPEG'))
+        self.assertEqual(Post.objects.get().image_format, 'JPEG')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=10)
+    def test_large_image_is_downsized(self):
+        """Картинка с большой стороной уменьшается при загрузке."""
+        self.create(self.make_image(40, 20))
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (10, 5))
+        self.assertEqual(post.image_format, 'PNG')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (10, 5))
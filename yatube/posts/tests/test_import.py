@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import search
+from posts.models import AuthorStats, Follow, Group, Post, TimelineEntry
+
+
+User = get_user_model()
+
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='imported', description='Описание')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_posts(self, path, *args):
+        errors = StringIO()
+        call_command('import_posts', path, *args,
+                     stdout=StringIO(), stderr=errors)
+        return errors.getvalue()
+
+    def test_jsonl_import_rebuilds_derived_data(self):
+        """После импорта счетчики, ленты и поиск учитывают новые посты."""
+        rows = [
+            {'text': 'Архивный пост про зиму', 'author': 'author',
+             'group': 'imported', 'pub_date': '2015-01-02T03:04:05+00:00'},
+            {'text': 'Второй архивный', 'author': 'author'},
+            {'text': 'Чужой автор', 'author': 'nobody'},
+            {'text': '', 'author': 'author'},
+            {'text': 5, 'author': 'author'},
+            {'text': 'Пост', 'author': ['author']},
+            {'text': 'Пост', 'author': 'author',
+             'pub_date': '2020-13-01T00:00:00'},
+        ]
+        lines = [json.dumps(row, ensure_ascii=False) for row in rows]
+        lines.append('not json')
+        path = self.write('posts.jsonl', '\n'.join(lines) + '\n')
+        errors = self.import_posts(path, '--batch-size', '2')
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(errors.count('Строка'), 6)
+        old = Post.objects.get(text='Архивный пост про зиму')
+        self.assertEqual(
+            old.pub_date,
+            timezone.make_aware(datetime(2015, 1, 2, 3, 4, 5), timezone.utc))
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 2)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        if search.enabled():
+            self.assertEqual(
+                list(search.matching(Post.objects.all(), 'зиму')), [old])
+
+    def test_import_with_signals_keeps_dates(self):
+        """Посты по одному через сигналы тоже сохраняют дату из файла."""
+        path = self.write('posts.jsonl', json.dumps(
+            {'text': 'Старый пост', 'author': 'author',
+             'pub_date': '2015-01-02T03:04:05+00:00'}) + '\n')
+        self.import_posts(path, '--with-signals')
+        post = Post.objects.get()
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(
+            TimelineEntry.objects.get(user=self.reader).pub_date,
+            post.pub_date)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+
+    def test_csv_import_creates_authors(self):
+        """Из CSV неизвестные авторы создаются по флагу --create-authors."""
+        path = self.write(
+            'posts.csv', 'text,author,group\nНовый голос,newcomer,\n')
+        self.import_posts(path, '--create-authors')
+        newcomer = User.objects.get(username='newcomer')
+        self.assertFalse(newcomer.has_usable_password())
+        self.assertEqual(newcomer.posts.get().text, 'Новый голос')
+        self.assertEqual(
+            AuthorStats.objects.get(user=newcomer).posts_count, 1)
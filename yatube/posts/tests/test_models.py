@@ -1,6 +1,18 @@
+from io import StringIO
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from ..models import Group, Post
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from ..feeds import get_feed_posts
+from ..models import (AuthorStats, Comment, Follow, Group, Post,
+                      TimelineEntry)
+from ..paginators import CursorPaginator
+from ..timelines import TimelinePaginator, timeline_entries
+from ..views import COMMENTS_ORDERING
 
 
 User = get_user_model()
@@ -67,3 +79,209 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='counters', description='Описание')
+        self.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        follow.delete()
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_full_save_keeps_concurrent_counts(self):
+        """Сохранение загруженного ранее объекта не затирает счетчики."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        stale_post = Post.objects.get(pk=post.pk)
+        stale_group = Group.objects.get(pk=self.group.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Post.objects.create(author=self.author, text='Еще', group=self.group)
+        stale_post.text = 'Правка'
+        stale_post.save()
+        stale_group.title = 'Новое название'
+        stale_group.save()
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.text, 'Правка')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.title, 'Новое название')
+        self.assertEqual(self.group.posts_count, 2)
+
+    def test_missing_stats_row_is_recreated(self):
+        """Без строки счетчиков автора она создается по данным."""
+        Post.objects.create(author=self.author, text='Первый')
+        AuthorStats.objects.filter(user=self.author).delete()
+        Post.objects.create(author=self.author, text='Второй')
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        author_id = self.author.id
+        self.author.delete()
+        self.assertFalse(
+            AuthorStats.objects.filter(user_id=author_id).exists())
+
+    def test_recount_counters_repairs_values(self):
+        """Команда recount_counters восстанавливает сбитые счетчики."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        AuthorStats.objects.filter(user=self.author).delete()
+        Group.objects.update(posts_count=5)
+        Post.objects.update(comments_count=7)
+
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса в формате SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plan', description='Описание')
+
+    def index_name(self, model, fields):
+        for index in model._meta.indexes:
+            if index.fields == fields:
+                return index.name
+        return None
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент читают индекс и не сортируют записи отдельно."""
+        cases = {
+            'index': (
+                get_feed_posts()[:10],
+                self.index_name(Post, ['-pub_date', '-id']),
+            ),
+            'timeline': (
+                timeline_entries(self.user).values_list('post_id')[:10],
+                self.index_name(
+                    TimelineEntry, ['user', '-pub_date', '-post']),
+            ),
+            'group': (
+                get_feed_posts(group=self.group)[:10],
+                self.index_name(Post, ['group', '-pub_date', '-id']),
+            ),
+            'author': (
+                get_feed_posts(author=self.user)[:10],
+                self.index_name(Post, ['author', '-pub_date', '-id']),
+            ),
+            'comments': (
+                Comment.objects.filter(post_id=1)[:10],
+                self.index_name(Comment, ['post', '-created', '-id']),
+            ),
+            'follow': (
+                Follow.objects.filter(user=self.user, author_id=1),
+                'INDEX sqlite_autoindex_posts_follow_1 '
+                '(user_id=? AND author_id=?)',
+            ),
+        }
+        for name, (queryset, index) in cases.items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_cursor_pages_seek_index(self):
+        """Страница после курсора начинается с поиска границы в индексе."""
+        values = [timezone.now(), 100]
+        cases = {
+            'index': (CursorPaginator(get_feed_posts(), 10), 'pub_date'),
+            'timeline': (
+                TimelinePaginator(timeline_entries(self.user), 10),
+                'pub_date',
+            ),
+            'group': (
+                CursorPaginator(get_feed_posts(group=self.group), 10),
+                'pub_date',
+            ),
+            'author': (
+                CursorPaginator(get_feed_posts(author=self.user), 10),
+                'pub_date',
+            ),
+            'comments': (
+                CursorPaginator(Comment.objects.filter(post_id=1), 10,
+                                COMMENTS_ORDERING),
+                'created',
+            ),
+        }
+        for name, (paginator, field) in cases.items():
+            for backwards, bound in ((False, '<'), (True, '>')):
+                with self.subTest(query=name, backwards=backwards):
+                    queryset = paginator.object_list.filter(
+                        paginator._keyset_filter(values, backwards))
+                    if backwards:
+                        queryset = queryset.reverse()
+                    plan = queryset[:11].explain()
+                    self.assertIn(f'{field}{bound}?', plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+
+class FollowDedupeMigrationTest(TransactionTestCase):
+    before = [('posts', '0017_counters')]
+    after = [('posts', '0018_feed_indexes')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_counters_recounted_after_dedupe(self):
+        """Удаленные повторы подписок не остаются в счетчиках."""
+        apps = self.migrate(self.before)
+        OldUser = apps.get_model('auth', 'User')
+        reader = OldUser.objects.create(username='reader')
+        author = OldUser.objects.create(username='author')
+        for _ in range(2):
+            apps.get_model('posts', 'Follow').objects.create(
+                user=reader, author=author)
+        stats = apps.get_model('posts', 'AuthorStats').objects
+        stats.create(user=reader, following_count=2)
+        stats.create(user=author, followers_count=2)
+
+        apps = self.migrate(self.after)
+        stats = apps.get_model('posts', 'AuthorStats').objects
+        self.assertEqual(
+            stats.get(user_id=reader.pk).following_count, 1)
+        self.assertEqual(
+            stats.get(user_id=author.pk).followers_count, 1)
@@ -0,0 +1,77 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Индекс FTS5 есть только в SQLite')
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer')
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.single = Post.objects.create(
+            author=self.user, text='Утром пили чай с лимоном')
+        self.triple = Post.objects.create(
+            author=self.user, text='Чай, чай и еще раз чай')
+        Post.objects.create(author=self.user, text='Кофе без сахара')
+
+    def search(self, query, **params):
+        return self.client.get(reverse('posts:search'), {'q': query, **params})
+
+    def test_results_ranked_and_highlighted(self):
+        """Поиск находит посты по словам и ставит выше более точные."""
+        response = self.search('чай')
+        posts = list(response.context['page_obj'])
+        self.assertEqual(posts, [self.triple, self.single])
+        self.assertContains(response, '<mark>чай</mark>', html=False)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.single.text = 'Утром пили какао'
+        self.single.save()
+        self.assertEqual(
+            list(self.search('чай').context['page_obj']), [self.triple])
+        self.assertEqual(
+            list(self.search('кака').context['page_obj']), [self.single])
+        self.triple.delete()
+        self.assertEqual(list(self.search('чай').context['page_obj']), [])
+
+    def test_snippet_is_escaped(self):
+        """Текст поста в сниппете экранируется, подсветка остается."""
+        Post.objects.create(author=self.user, text='<b>чай</b> горячий')
+        response = self.search('горячий')
+        self.assertContains(response, '&lt;b&gt;чай&lt;/b&gt;')
+        self.assertContains(response, '<mark>горячий</mark>', html=False)
+
+    def test_cursor_pagination(self):
+        """Следующая страница поиска продолжает выдачу по курсору."""
+        with patch('posts.views.LIMIT_POSTS', 1):
+            first = self.search('чай').context['page_obj']
+            second = self.search(
+                'чай', cursor=first.next_cursor).context['page_obj']
+        self.assertEqual(list(first), [self.triple])
+        self.assertEqual(list(second), [self.single])
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет через индекс, а не через LIKE."""
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'лимоном'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.single])
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('posts_post_fts', sql)
+        self.assertNotIn('LIKE', sql)
@@ -0,0 +1,189 @@
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.storage import is_content_addressed
+from posts import thumbnails
+from posts.models import Post
+
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_ALWAYS_EAGER=True)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='painter')
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def thumbnail_url(self, post):
+        geometry, options = thumbnails.VARIANTS[0]
+        return thumbnails.default.backend.get_thumbnail(
+            post.image, geometry, **options).url
+
+    def test_page_does_not_build_thumbnails(self):
+        """Страница без готовой миниатюры показывает исходную картинку."""
+        post = self.create_post()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.id]))
+        self.assertContains(response, post.image.url)
+        self.assertEqual(self.thumbnail_url(post), post.image.url)
+
+    def test_thumbnails_built_after_commit(self):
+        """Сохранение картинки строит миниатюры после коммита."""
+        with patch('posts.signals.transaction.on_commit',
+                   lambda callback: callback()):
+            post = self.create_post()
+        url = self.thumbnail_url(post)
+        self.assertNotEqual(url, post.image.url)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.id]))
+        self.assertContains(response, url)
+
+    def test_picture_lists_all_widths(self):
+        """Картинка отдается с srcset по всем ширинам и ленивой загрузкой."""
+        with patch('posts.signals.transaction.on_commit',
+                   lambda callback: callback()):
+            post = self.create_post()
+        response = self.client.get(reverse('posts:index'))
+        for width in thumbnails.POST_IMAGE_WIDTHS:
+            with self.subTest(width=width):
+                self.assertContains(response, f' {width}w')
+        self.assertContains(response, f'sizes="{thumbnails.POST_IMAGE_SIZES}"')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertNotContains(response, post.image.url)
+
+    def test_feed_page_resolves_thumbnails_in_one_lookup(self):
+        """Миниатюры всей страницы ленты ищутся одним обращением."""
+        with patch('posts.signals.transaction.on_commit',
+                   lambda callback: callback()):
+            posts = [self.create_post() for _ in range(3)]
+        cache.clear()
+        kvstore_cache = thumbnails.default.kvstore.cache
+        with patch.object(thumbnails.default.kvstore, '_get_raw') as get_raw, \
+                patch.object(kvstore_cache, 'get_many',
+                             wraps=kvstore_cache.get_many) as get_many:
+            response = self.client.get(reverse('posts:index'))
+        get_raw.assert_not_called()
+        thumbnail_lookups = [
+            call for call in get_many.call_args_list
+            if any('sorl-thumbnail' in key for key in call[0][0])
+        ]
+        self.assertEqual(len(thumbnail_lookups), 1)
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertContains(response, self.thumbnail_url(post))
+
+    def test_posts_sharing_image_get_thumbnails(self):
+        """Посты с одной и той же картинкой получают миниатюры оба."""
+        with patch('posts.signals.transaction.on_commit',
+                   lambda callback: callback()):
+            first, second = self.create_post(), self.create_post()
+        self.assertEqual(first.image.name, second.image.name)
+        posts = list(Post.objects.filter(pk__in=[first.pk, second.pk]))
+        thumbnails.attach_thumbnails(posts)
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertEqual(
+                    len(post.thumbnails), len(thumbnails.VARIANTS))
+                self.assertNotEqual(
+                    thumbnails.picture(post)['src'], post.image.url)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_ALWAYS_EAGER=True)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='photographer')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('meta.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def assertMetadata(self, post):
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_format, 'GIF')
+        self.assertEqual(
+            post.image_hash, hashlib.sha256(SMALL_GIF).hexdigest())
+
+    def test_metadata_filled_at_upload(self):
+        """Размеры, формат и хеш картинки сохраняются при загрузке."""
+        self.assertMetadata(Post.objects.get(pk=self.post.pk))
+
+    def test_metadata_cleared_with_image(self):
+        """Без картинки метаданные очищаются."""
+        self.post.image = None
+        self.post.save()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_hash, '')
+
+    def test_backfill_command(self):
+        """Команда заполняет метаданные у старых постов."""
+        Post.objects.update(
+            image_width=None, image_height=None,
+            image_format='', image_hash='')
+        call_command('backfill_image_metadata', stdout=StringIO())
+        self.assertMetadata(Post.objects.get(pk=self.post.pk))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_ALWAYS_EAGER=True)
+class ImageStorageMigrationTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_legacy_images_are_moved(self):
+        """Команда переносит старые файлы под имена по хешу."""
+        legacy = FileSystemStorage().save(
+            'posts/legacy.gif', ContentFile(SMALL_GIF))
+        user = User.objects.create_user(username='legacy')
+        post = Post.objects.create(author=user, text='Старый', image=legacy)
+        call_command('migrate_image_storage', '--delete-originals',
+                     stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(is_content_addressed(post.image.name))
+        self.assertTrue(default_storage.exists(post.image.name))
+        self.assertFalse(default_storage.exists(legacy))
@@ -1,14 +1,31 @@
 import shutil
 import tempfile
+import time
+from http import HTTPStatus
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
 from django import forms
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Group, Post, Follow
+from django.utils.http import http_date
+from PIL import Image
+from core.query_budget import QueryBudgetExceeded, query_budget
+from core.templatetags.pagination import elided_page_range
+from posts.feed_counts import (GLOBAL_FEED, author_feed, count_key,
+                               follow_feed, group_feed)
+from posts import merge_feed, timelines
+from posts.page_cache import GROUPS_SCOPE, bump
+from posts.models import Comment, Group, Post, Follow, TimelineEntry
+from posts.views import LIMIT_COMMENTS, LIMIT_POSTS
 
 
 User = get_user_model()
@@ -182,15 +199,149 @@ class PostViewTests(TestCase):
             author=self.user)
         response_0 = self.authorized_client.get(
             reverse('posts:index')).content
-        post_0.delete()
+        Post.objects.filter(id=post_0.id).update(text='Без сигналов')
         response_1 = self.authorized_client.get(
             reverse('posts:index')).content
         self.assertEqual(response_0, response_1)
-        cache.clear()
+        post_0.delete()
         response_2 = self.authorized_client.get(
             reverse('posts:index')).content
         self.assertNotEqual(response_1, response_2)
 
+    def test_cache_invalidated_by_writes(self):
+        """Кэш лент сбрасывается сразу после изменения поста и группы."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[PostViewTests.group.slug]),
+            reverse('posts:profile', args=[PostViewTests.user.username]),
+        ]
+        for page in pages:
+            self.authorized_client.get(page)
+        post = Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group)
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                self.assertEqual(response.context['page_obj'][0], post)
+        self.group.description = 'Новое описание'
+        self.group.save()
+        response = self.authorized_client.get(pages[1])
+        self.assertContains(response, 'Новое описание')
+
+    def test_post_card_fragment_cache(self):
+        """Карточка поста берется из кэша, пока пост не изменен."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[PostViewTests.group.slug]),
+            reverse('posts:profile', args=[PostViewTests.user.username]),
+        ]
+        for page in pages:
+            self.authorized_client.get(page)
+        Post.objects.filter(id=self.post.id).update(text='Без сигналов')
+        bump(GROUPS_SCOPE)
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                self.assertNotContains(response, 'Без сигналов')
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Отредактированный пост'
+        post.save()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                self.assertContains(response, 'Отредактированный пост')
+
+    def test_conditional_get_for_feeds(self):
+        """Неизменившаяся лента отдает 304 без запроса постов."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[PostViewTests.group.slug]),
+            reverse('posts:profile', args=[PostViewTests.user.username]),
+        ]
+        etags = {}
+        for page in pages:
+            etags[page] = self.authorized_client.get(page)['ETag']
+            with self.subTest(page=page):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(
+                        page, HTTP_IF_NONE_MATCH=etags[page])
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                for query in queries.captured_queries:
+                    self.assertNotIn('posts_post', query['sql'])
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group)
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(
+                    page, HTTP_IF_NONE_MATCH=etags[page])
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_conditional_get_for_post_detail(self):
+        """Страница поста отдает 304, пока нет новых комментариев."""
+        url = reverse('posts:post_detail', args=[PostViewTests.post.id])
+        etag = self.authorized_client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[PostViewTests.post.id]),
+            data={'text': 'Новый комментарий'})
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_detail_ignores_if_modified_since(self):
+        """Страница поста проверяется только по ETag, не по дате."""
+        post = Post.objects.create(text='Пост', author=self.user)
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий')
+        url = reverse('posts:post_detail', args=[post.id])
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        since = http_date(time.time() + 60)
+        response = self.authorized_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        comment.delete()
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_detail_paginates_comments(self):
+        """Комментарии выводятся страницами, остальные догружаются."""
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        post = Post.objects.create(text='Обсуждаемый пост', author=self.user)
+        for number in range(LIMIT_COMMENTS + 5):
+            Comment.objects.create(
+                post=post, author=readers[number % 3],
+                text=f'Комментарий {number}')
+        url = reverse('posts:post_detail', args=[post.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), LIMIT_COMMENTS)
+        self.assertTrue(comments.has_next())
+        comment_queries = [
+            query for query in queries.captured_queries
+            if 'FROM "posts_comment"' in query['sql']
+            and 'MAX(' not in query['sql']
+        ]
+        self.assertEqual(len(comment_queries), 1)
+
+        more_url = reverse('posts:post_comments', args=[post.id])
+        response = self.client.get(
+            more_url, {'cursor': comments.next_cursor})
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertContains(response, 'Комментарий 0')
+        response = self.client.get(
+            more_url, {'cursor': comments.next_cursor, 'format': 'json'})
+        data = response.json()
+        self.assertEqual(len(data['comments']), 5)
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['comments'][-1]['text'], 'Комментарий 0')
+
 
 class PaginatorViewsTests(TestCase):
     @classmethod
@@ -253,6 +404,46 @@ class PaginatorViewsTests(TestCase):
                 response = self.author.get(page + '?page=2')
                 self.assertEqual(len(response.context.get('page_obj')), 3)
 
+    def test_cursor_pages_walk_whole_feed(self):
+        """Курсорная пагинация отдает все записи без повторов."""
+        for page in self.response_pages:
+            with self.subTest(reverse_name=page):
+                response = self.author.get(page + '?cursor=')
+                first_page = response.context.get('page_obj')
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                response = self.author.get(
+                    page + f'?cursor={first_page.next_cursor}')
+                second_page = response.context.get('page_obj')
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                ids = [post.id for post in first_page]
+                ids += [post.id for post in second_page]
+                self.assertEqual(len(set(ids)), 13)
+                response = self.author.get(
+                    page + f'?cursor={second_page.previous_cursor}')
+                self.assertEqual(
+                    [post.id for post in response.context.get('page_obj')],
+                    ids[:10])
+
+    def test_elided_page_range_is_bounded(self):
+        """Число ссылок пагинатора не зависит от размера ленты."""
+        paginator = Paginator(range(200000), 10)
+        self.assertEqual(
+            elided_page_range(paginator.page(500)),
+            [1, '…', 498, 499, 500, 501, 502, '…', 20000])
+        self.assertEqual(
+            elided_page_range(paginator.page(1)),
+            [1, 2, 3, '…', 20000])
+        self.assertEqual(
+            elided_page_range(Paginator(range(30), 10).page(2)), [1, 2, 3])
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор ведет на первую страницу."""
+        response = self.author.get(
+            reverse('posts:index') + '?cursor=broken')
+        self.assertEqual(len(response.context.get('page_obj')), 10)
+
 
 class FollowViewsTest(TestCase):
     @classmethod
@@ -309,6 +500,116 @@ class FollowViewsTest(TestCase):
         response = self.author_client.get(reverse('posts:follow_index'))
         self.assertIn(post, response.context['page_obj'].object_list)
 
+    def test_timeline_follows_subscriptions(self):
+        """Лента подписок заполняется при публикации и чистится отпиской."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.post).exists())
+        post = Post.objects.create(
+            text='Новый пост',
+            author=self.author,
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists())
+        self.author_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_timeline_filled_by_task_worker(self):
+        """Раскладка по лентам подписчиков выполняется воркером очереди."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Из очереди', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.follower).exists())
+        call_command('run_tasks', '--once', stdout=StringIO())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.follower).values_list('post', flat=True)),
+            {self.post.id, post.id})
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_follow_feed_count_reset_by_worker(self):
+        """Размеры лент подписчиков сбрасывает воркер, а не запрос автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        key = count_key(follow_feed(self.follower.id))
+        post = Post(text='Из очереди', author=self.author)
+        for change in (post.save, post.delete):
+            with self.subTest(change=change.__name__):
+                cache.set(key, 5)
+                with CaptureQueriesContext(connection) as queries:
+                    change()
+                for query in queries.captured_queries:
+                    self.assertNotIn('posts_follow', query['sql'])
+                self.assertEqual(cache.get(key), 5)
+                call_command('run_tasks', '--once', stdout=StringIO())
+                self.assertIsNone(cache.get(key))
+
+    def test_timeline_is_trimmed(self):
+        """В ленте подписок хранится ограниченное число записей."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Еще пост', author=self.author)
+        with patch('posts.timelines.TIMELINE_LENGTH', 1):
+            timelines.trim(self.follower.id)
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.follower).values_list('post', flat=True)),
+            [post.id])
+
+    def test_fan_out_keeps_timeline_length(self):
+        """Новые посты не раздувают ленту сверх TIMELINE_LENGTH."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        with patch('posts.timelines.TIMELINE_LENGTH', 2):
+            posts = [
+                Post.objects.create(text=f'Пост {number}', author=self.author)
+                for number in range(3)
+            ]
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.follower).values_list('post', flat=True)),
+            {posts[1].id, posts[2].id})
+
+    @patch('posts.timelines.FOLLOWERS_BATCH', 2)
+    @patch('posts.timelines.TIMELINE_LENGTH', 2)
+    def test_fan_out_in_batches(self):
+        """Подписчики обходятся пачками, каждая лента обрезается."""
+        followers = [self.follower] + [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(4)
+        ]
+        for follower in followers:
+            Follow.objects.create(user=follower, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            posts = [
+                Post.objects.create(text=f'Пост {number}', author=self.author)
+                for number in range(3)
+            ]
+        for follower in followers:
+            with self.subTest(follower=follower.username):
+                self.assertEqual(
+                    set(TimelineEntry.objects.filter(
+                        user=follower).values_list('post', flat=True)),
+                    {posts[1].id, posts[2].id})
+        deletes = [query for query in queries.captured_queries
+                   if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3 * 3)
+
+    def test_follow_feed_cursor_pages(self):
+        """Лента подписок листается по курсору записей ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+            for number in range(LIMIT_POSTS + 1)
+        ]
+        url = reverse('posts:follow_index')
+        first = self.author_client.get(url, {'cursor': ''}).context['page_obj']
+        second = self.author_client.get(
+            url, {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(first), posts[::-1][:LIMIT_POSTS])
+        self.assertEqual(list(second), [posts[0], self.post])
+        self.assertFalse(second.has_next())
+
     def test_notfollow_on_authors(self):
         """Проверка наличия постов у неподписчиков."""
         post = Post.objects.create(
@@ -317,3 +618,171 @@ class FollowViewsTest(TestCase):
         )
         response = self.author_client.get(reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'].object_list)
+
+
+class FeedCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_feed_count_follows_post_signals(self):
+        """Кэшированные размеры лент обновляются при создании и удалении."""
+        feeds = [
+            GLOBAL_FEED, group_feed(self.group.id), author_feed(self.user.id)
+        ]
+        self.guest_client.get(
+            reverse('posts:group_list', args=[self.group.slug]))
+        self.guest_client.get(reverse('posts:profile', args=['auth']))
+        self.guest_client.get(reverse('posts:index'))
+        post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group)
+        for feed in feeds:
+            with self.subTest(feed=feed):
+                self.assertEqual(cache.get(count_key(feed)), 1)
+        post.delete()
+        for feed in feeds:
+            with self.subTest(feed=feed):
+                self.assertEqual(cache.get(count_key(feed)), 0)
+
+    def test_paginator_reads_cached_count(self):
+        """Paginator не выполняет COUNT(*), если размер ленты в кэше."""
+        Post.objects.create(text='Тестовый пост', author=self.user)
+        cache.set(count_key(GLOBAL_FEED), 1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+
+@override_settings(QUERY_BUDGET_ENABLED=True, MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        for i in range(LIMIT_POSTS):
+            author = User.objects.create_user(username=f'author{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'group-{i}',
+                description='Тестовое описание'
+            )
+            image = Image.new('RGB', (2, 1), (i, i, i))
+            content = BytesIO()
+            image.save(content, format='GIF')
+            Post.objects.create(
+                text='Тестовый пост', author=author, group=group,
+                image=SimpleUploadedFile(
+                    f'post{i}.gif', content.getvalue(), 'image/gif'),
+            )
+            Follow.objects.create(user=cls.user, author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_feeds_fit_query_budget(self):
+        """Автор, группа и миниатюры постов читаются без запроса на пост."""
+        post = Post.objects.filter(author__username='author0').get()
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['group-0']),
+            reverse('posts:profile', args=['author0']),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=[post.id]),
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=['group-0']),
+            reverse('posts:api_profile', args=['author0']),
+            reverse('posts:api_follow_index'),
+            reverse('posts:api_post_detail', args=[post.id]),
+        ]
+        for page in pages:
+            with self.subTest(page=page):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(page)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                lookups = [
+                    query for query in queries.captured_queries
+                    if 'thumbnail_kvstore' in query['sql']
+                ]
+                self.assertEqual(len(lookups), 1)
+
+    def test_query_budget_fails_loudly(self):
+        """Превышение бюджета запросов приводит к ошибке."""
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                list(Post.objects.all())
+                list(Group.objects.all())
+
+
+@override_settings(FOLLOW_FEED_ENGINE='merge')
+class MergedFollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='follower')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.follower, author=author)
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+        cache.clear()
+
+    def test_merged_feed_matches_sql_feed(self):
+        """Слияние списков авторов дает ту же ленту, что и SQL."""
+        for i in range(12):
+            Post.objects.create(
+                text=f'Пост {i}', author=self.authors[i % 3])
+        Post.objects.create(
+            text='Чужой пост',
+            author=User.objects.create_user(username='stranger'))
+        expected = list(Post.objects.filter(
+            author__following__user=self.follower).order_by(
+                '-pub_date', '-id'))
+        first = self.follower_client.get(reverse('posts:follow_index'))
+        second = self.follower_client.get(
+            reverse('posts:follow_index') + '?page=2')
+        self.assertEqual(
+            list(first.context['page_obj']) + list(second.context['page_obj']),
+            expected)
+
+    def test_merged_feed_sees_new_posts(self):
+        """Новый пост попадает в закэшированный список автора."""
+        self.follower_client.get(reverse('posts:follow_index'))
+        post = Post.objects.create(text='Свежий пост', author=self.authors[0])
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_new_post_resets_cached_list_after_commit(self):
+        """Новый пост сбрасывает список автора и сразу, и после коммита."""
+        self.follower_client.get(reverse('posts:follow_index'))
+        key = merge_feed.recent_key(self.authors[0].id)
+        with patch('posts.merge_feed.transaction.on_commit') as on_commit:
+            Post.objects.create(text='Свежий пост', author=self.authors[0])
+        self.assertIsNone(cache.get(key))
+        self.follower_client.get(reverse('posts:follow_index'))
+        self.assertIsNotNone(cache.get(key))
+        on_commit.call_args[0][0]()
+        self.assertIsNone(cache.get(key))
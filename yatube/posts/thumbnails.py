@@ -0,0 +1,197 @@
+import logging
+
+from django.core.files.storage import default_storage
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core import tasks
+from .models import Post
+
+
+logger = logging.getLogger(__name__)
+
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+FORMATS = ('WEBP', 'JPEG') if features.check('webp') else ('JPEG',)
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+def geometry(width):
+    base_width, base_height = POST_IMAGE_SIZE
+    return f'{width}x{round(width * base_height / base_width)}'
+
+
+VARIANTS = tuple(
+    (geometry(width), {**POST_IMAGE_OPTIONS, 'format': image_format})
+    for image_format in FORMATS
+    for width in POST_IMAGE_WIDTHS
+)
+
+
+class PrebuiltThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который при рендеринге только ищет готовые миниатюры.
+
+    Миниатюры строятся заранее (build), а если нужной еще нет, вместо
+    нее отдается исходная картинка: страница не ждет декодирования и
+    сжатия изображения.
+    """
+
+    def _thumbnail_file(self, source, geometry_string, options):
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def find(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None, если ее еще не построили."""
+        source = ImageFile(file_)
+        thumbnail = self._thumbnail_file(source, geometry_string, options)
+        return default.kvstore.get(thumbnail)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        return (self.find(file_, geometry_string, **options)
+                or ImageFile(file_))
+
+    def build(self, file_, geometry_string, **options):
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def build(name):
+    """Построить недостающие варианты миниатюр для картинки поста.
+
+    Посты с этой картинкой пересохраняются, чтобы страницы и карточки
+    в кэше получили миниатюры вместо исходника.
+    """
+    source = ImageFile(name, default_storage)
+    built = False
+    for size, options in VARIANTS:
+        if default.backend.find(source, size, **options):
+            continue
+        try:
+            default.backend.build(source, size, **options)
+            built = True
+        except Exception:
+            logger.exception('Не удалось построить миниатюру %s', name)
+    if built:
+        for post in Post.objects.filter(image=name):
+            post.save(update_fields=['updated'])
+
+
+def variant_files(post):
+    source = ImageFile(post.image)
+    for image_format in FORMATS:
+        for width in POST_IMAGE_WIDTHS:
+            options = {**POST_IMAGE_OPTIONS, 'format': image_format}
+            yield (image_format, width), default.backend._thumbnail_file(
+                source, geometry(width), options)
+
+
+def attach_thumbnails(posts):
+    """Найти готовые миниатюры всех постов страницы за одно обращение.
+
+    Записи sorl читаются одним get_many из кэша, промахи добираются
+    одним запросом к таблице thumbnail_kvstore. Результат кладется
+    в post.thumbnails, его читает picture(). У постов с одинаковой
+    картинкой общий файл, а значит и общие миниатюры.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return
+    wanted = {}
+    for post in posts:
+        if not post.image:
+            continue
+        post.thumbnails = {}
+        for variant, thumbnail in variant_files(post):
+            wanted.setdefault(add_prefix(thumbnail.key), []).append(
+                (post, variant))
+    if not wanted:
+        return
+    values = kvstore.cache.get_many(list(wanted))
+    missing = [key for key in wanted if key not in values]
+    if missing:
+        stored = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        kvstore.cache.set_many(
+            {
+                key: stored.get(key, cached_db_kvstore.EMPTY_VALUE)
+                for key in missing
+            },
+            thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+        values.update(stored)
+    for key, value in values.items():
+        if value is None or value == cached_db_kvstore.EMPTY_VALUE:
+            continue
+        thumbnail = deserialize_image_file(value)
+        for post, variant in wanted[key]:
+            post.thumbnails[variant] = thumbnail
+
+
+def picture(post):
+    """Данные для <picture>: srcset по форматам из готовых миниатюр.
+
+    Пока миниатюр нет, остается исходная картинка с размерами,
+    сохраненными в посте при загрузке.
+    """
+    image = post.image
+    resolved = getattr(post, 'thumbnails', None)
+    sources = []
+    fallback = None
+    for image_format in FORMATS:
+        found = []
+        for width in POST_IMAGE_WIDTHS:
+            if resolved is not None:
+                thumbnail = resolved.get((image_format, width))
+            else:
+                thumbnail = default.backend.find(
+                    image, geometry(width),
+                    **POST_IMAGE_OPTIONS, format=image_format)
+            if thumbnail:
+                found.append(thumbnail)
+        if not found:
+            continue
+        sources.append({
+            'type': MIME_TYPES[image_format],
+            'srcset': ', '.join(
+                f'{thumbnail.url} {thumbnail.width}w' for thumbnail in found),
+        })
+        if image_format == 'JPEG':
+            fallback = found[min(1, len(found) - 1)]
+    if fallback is None:
+        return {
+            'sources': sources,
+            'src': image.url,
+            'width': post.image_width,
+            'height': post.image_height,
+            'sizes': POST_IMAGE_SIZES,
+        }
+    return {
+        'sources': sources,
+        'src': fallback.url,
+        'width': fallback.width,
+        'height': fallback.height,
+        'sizes': POST_IMAGE_SIZES,
+    }
+
+
+def schedule(name):
+    """Поставить сборку миниатюр картинки в очередь задач."""
+    tasks.enqueue('posts.build_thumbnails', name)
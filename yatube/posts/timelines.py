@@ -0,0 +1,157 @@
+from django.db import connection
+
+from . import feed_counts
+from .feeds import get_feed_posts
+from .models import Follow, Post, TimelineEntry
+from .paginators import CursorPaginator, pack_cursor
+
+
+TIMELINE_LENGTH = 1000
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+FOLLOWERS_BATCH = 500
+
+
+def follower_batches(author_id):
+    """Идентификаторы подписчиков автора пачками по FOLLOWERS_BATCH.
+
+    Пачки выбираются по id подписки, поэтому между ними курсор базы
+    не держится открытым и в памяти лежит только одна пачка.
+    """
+    follows = Follow.objects.filter(author_id=author_id).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(follows.filter(id__gt=last_id).values_list(
+            'id', 'user_id')[:FOLLOWERS_BATCH])
+        if not batch:
+            return
+        last_id = batch[-1][0]
+        yield [user_id for _, user_id in batch]
+
+
+def forget_counts(user_ids):
+    feed_counts.forget([feed_counts.follow_feed(pk) for pk in user_ids])
+
+
+def forget_follower_counts(author_id):
+    """Сбросить закэшированные размеры лент всех подписчиков автора."""
+    for batch in follower_batches(author_id):
+        forget_counts(batch)
+
+
+def fan_out(post):
+    """Разложить новый пост по лентам подписчиков автора.
+
+    Кэшированные размеры их лент сбрасываются здесь же, после вставки.
+    """
+    for followers in follower_batches(post.author_id):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id, post=post, pub_date=post.pub_date)
+                for user_id in followers
+            ],
+            batch_size=FOLLOWERS_BATCH,
+            ignore_conflicts=True,
+        )
+        trim(*followers)
+        forget_counts(followers)
+
+
+def backfill(user_id, author_id):
+    """Добавить в ленту подписчика последние посты нового автора."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date')[:TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def drop(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def trim(*user_ids):
+    """Оставить в лентах пользователей не больше TIMELINE_LENGTH записей.
+
+    Лишние записи всей пачки находятся одним запросом с ROW_NUMBER()
+    по индексу ленты (user, -pub_date, -post).
+    """
+    sql = (
+        'DELETE FROM {table} WHERE id IN ('
+        ' SELECT id FROM ('
+        '  SELECT id, ROW_NUMBER() OVER ('
+        '   PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+        '  ) AS position FROM {table} WHERE user_id IN ({placeholders})'
+        ' ) WHERE position > %s'
+        ')'
+    ).format(
+        table=TimelineEntry._meta.db_table,
+        placeholders=', '.join(['%s'] * len(user_ids)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*user_ids, TIMELINE_LENGTH])
+
+
+def rebuild(user_id):
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True)
+    for author_id in authors:
+        backfill(user_id, author_id)
+
+
+def timeline_entries(user):
+    return TimelineEntry.objects.filter(user=user).order_by(
+        *TIMELINE_ORDERING)
+
+
+def load_posts(post_ids):
+    posts = get_feed_posts(id__in=post_ids).in_bulk()
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+class TimelineFeed:
+    """Лента подписок для постраничной навигации по номерам.
+
+    Срез читает идентификаторы постов из ленты пользователя по индексу
+    (user, -pub_date, -post), а сами посты подгружаются вторым запросом
+    по первичному ключу, без соединения и сортировки всей ленты.
+    """
+
+    def __init__(self, user):
+        self.entries = timeline_entries(user)
+
+    def count(self):
+        return self.entries.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        return load_posts(list(
+            self.entries.values_list('post_id', flat=True)[index]))
+
+
+class TimelinePaginator(CursorPaginator):
+    """Keyset-пагинация ленты подписок по ключу записи (pub_date, post)."""
+
+    def __init__(self, entries, per_page):
+        super().__init__(
+            entries.only('post_id', 'pub_date'), per_page, TIMELINE_ORDERING)
+
+    def encode_cursor(self, direction, post):
+        pub_date = Post._meta.get_field('pub_date').value_to_string(post)
+        return pack_cursor(direction, [pub_date, str(post.id)])
+
+    def _fetch(self, values, backwards, limit):
+        entries = super()._fetch(values, backwards, limit)
+        return load_posts([entry.post_id for entry in entries])
@@ -1,44 +1,97 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models.query import QuerySet
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.http import etag
 
+from core.query_budget import query_budget
+from . import exporting
 from .models import User, Post, Group, Comment, Follow
 from .forms import PostForm, CommentForm
+from .feeds import get_feed_posts
+from .feed_counts import GLOBAL_FEED, author_feed, follow_feed, group_feed
+from .merge_feed import MergedFollowFeed
+from .page_cache import (GROUPS_SCOPE, INDEX_SCOPE, author_scope,
+                         cache_versioned_page, get_versions, group_scope)
+from .paginators import CachedCountPaginator, CursorPaginator
+from .search import search_page
+from .thumbnails import attach_thumbnails
+from .timelines import TimelineFeed, TimelinePaginator
 
 
 LIMIT_POSTS = 10
+LIMIT_COMMENTS = 20
+COMMENTS_ORDERING = ('-created', '-id')
+
+
+def get_cursor_paginator(posts):
+    if isinstance(posts, QuerySet):
+        return CursorPaginator(posts, LIMIT_POSTS)
+    if isinstance(posts, TimelineFeed):
+        return TimelinePaginator(posts.entries, LIMIT_POSTS)
+    return None
 
 
-def get_pagination(posts, request):
-    paginator = Paginator(posts, LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def get_pagination(posts, request, feed=None):
+    paginator = None
+    if 'cursor' in request.GET:
+        paginator = get_cursor_paginator(posts)
+    if paginator is not None:
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        if feed is None:
+            paginator = Paginator(posts, LIMIT_POSTS)
+        else:
+            paginator = CachedCountPaginator(posts, LIMIT_POSTS, feed)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = list(page_obj.object_list)
+    attach_thumbnails(page_obj.object_list)
     return {
         'page_obj': page_obj,
     }
 
 
-@cache_page(20, key_prefix='index_page')
+def get_comments_page(post_id, cursor=None):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    paginator = CursorPaginator(comments, LIMIT_COMMENTS, COMMENTS_ORDERING)
+    return paginator.get_page(cursor)
+
+
+@cache_versioned_page(lambda request: [INDEX_SCOPE, GROUPS_SCOPE])
+@query_budget(4)
 def index(request):
     template = 'posts/index.html'
-    context = get_pagination(Post.objects.all(), request)
+    context = get_pagination(get_feed_posts(), request, GLOBAL_FEED)
     return render(request, template, context)
 
 
+@cache_versioned_page(
+    lambda request, slug: [group_scope(slug), GROUPS_SCOPE])
+@query_budget(5)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     context = {
         'group': group,
     }
-    context.update(get_pagination(group.posts.all(), request))
+    context.update(get_pagination(
+        get_feed_posts(group=group), request, group_feed(group.id)))
     return render(request, template, context)
 
 
+@cache_versioned_page(
+    lambda request, username: [author_scope(username), GROUPS_SCOPE])
+@query_budget(7)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     following = request.user.is_authenticated
     if following:
         following = author.following.filter(user=request.user).exists()
@@ -46,15 +99,40 @@ def profile(request, username):
         'author': author,
         'following': following
     }
-    context.update(get_pagination(author.posts.all(), request))
+    context.update(get_pagination(
+        get_feed_posts(author=author), request, author_feed(author.id)))
     return render(request, template, context)
 
 
+def post_detail_etag(request, post_id):
+    """ETag страницы поста.
+
+    Страница зависит и от зрителя (форма комментария, кнопка правки,
+    CSRF-токен), и от автора с группой, поэтому Last-Modified по одному
+    updated не отдается: проверку делает только ETag.
+    """
+    state = Post.objects.filter(id=post_id).values_list(
+        'updated', 'comments_count', 'author__username').first()
+    if state is None:
+        return None
+    updated, comments_count, username = state
+    versions = get_versions([author_scope(username), GROUPS_SCOPE])
+    get_token(request)
+    csrf = hashlib.md5(
+        request.META['CSRF_COOKIE'].encode()).hexdigest()[:8]
+    return '-'.join(str(part) for part in (
+        updated.timestamp(), comments_count, *versions,
+        request.user.pk or 0, csrf))
+
+
+@etag(post_detail_etag)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = Post.objects.prefetch_related('group').get(id=post_id)
+    post = Post.objects.select_related('author__stats', 'group').get(
+        id=post_id)
+    attach_thumbnails([post])
     form = CommentForm()
-    comments = Comment.objects.filter(post=post)
+    comments = get_comments_page(post.id)
 
     context = {
         'post': post,
@@ -64,6 +142,58 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = search_page(query, LIMIT_POSTS, request.GET.get('cursor'))
+    if page_obj is not None:
+        attach_thumbnails(page_obj.object_list)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+def post_comments(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    comments = get_comments_page(post_id, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    return render(request, 'posts/includes/comments.html', {
+        'post_id': post_id,
+        'comments': comments,
+    })
+
+
+@login_required
+def export(request, kind):
+    export_format = request.GET.get('format', 'jsonl')
+    if kind not in exporting.EXPORTS or export_format not in exporting.FORMATS:
+        raise Http404
+    response = StreamingHttpResponse(
+        exporting.export_lines(kind, export_format, user=request.user),
+        content_type=exporting.CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{kind}.{export_format}"')
+    return response
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -119,10 +249,17 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(4)
 def follow_index(request):
     template = 'posts/follow.html'
-    context = get_pagination(Post.objects.filter(
-        author__following__user=request.user), request)
+    if settings.FOLLOW_FEED_ENGINE == 'merge':
+        context = get_pagination(MergedFollowFeed(request.user), request)
+    else:
+        context = get_pagination(
+            TimelineFeed(request.user),
+            request,
+            follow_feed(request.user.id),
+        )
     return render(request, template, context)
 
 
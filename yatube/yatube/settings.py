@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -24,6 +25,7 @@ SECRET_KEY = 'h+x@pl3xhf(7!j5o_ljy^-%*i9_21vjj3esg4k$8b(xxm7^v8h'
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
+QUERY_BUDGET_ENABLED = DEBUG
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 ALLOWED_HOSTS = [
@@ -143,6 +145,58 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
     }
 }
+
+# Test runs (manage.py test, pytest) get a private in-memory cache so they
+# neither clear nor read the development cache file.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tests',
+        }
+    }
+
+# Follow feed read path: 'timeline' reads materialized per-user timelines,
+# 'merge' k-way merges recent posts of followed authors from the cache.
+FOLLOW_FEED_ENGINE = 'timeline'
+
+# Thumbnails are built ahead of time by the task queue; templates only look
+# up finished ones and fall back to the original image.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PrebuiltThumbnailBackend'
+
+# Uploads are streamed to temporary files instead of memory. Bytes past
+# UPLOAD_MAX_SIZE are dropped and the form rejects the file. Post images
+# over POST_IMAGE_MAX_PIXELS are refused before decoding; larger sides than
+# POST_IMAGE_MAX_SIDE are scaled down on upload. Only JPEG can be decoded at
+# reduced scale, other formats are decoded in full (4 bytes per pixel), so
+# they are capped at POST_IMAGE_MAX_DECODED_PIXELS instead.
+FILE_UPLOAD_HANDLERS = ['core.uploads.LimitedTemporaryFileUploadHandler']
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_DECODED_PIXELS = 16_000_000
+POST_IMAGE_MAX_SIDE = 2560
+
+# Media files are stored under their content hash (see core.storage);
+# sorl thumbnails keep their own generated names in plain file storage.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Background tasks (see core.tasks) are stored in the database and run by
+# `manage.py run_tasks`. TASKS_ALWAYS_EAGER runs them inline instead, which
+# keeps development and test runs free of a separate worker process. Failed
+# tasks are retried after TASKS_RETRY_DELAY * 2 ** (attempt - 1) seconds;
+# running tasks older than TASKS_LOCK_TIMEOUT are handed to another worker.
+TASKS_ALWAYS_EAGER = DEBUG
+TASKS_WORKERS = 2
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 10
+TASKS_LOCK_TIMEOUT = 10 * 60